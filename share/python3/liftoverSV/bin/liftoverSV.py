@@ -81,7 +81,7 @@ def main(argv):
     # (to keep here after the definition of the correct relative path to sys.path)
     ##############################################################################
     from workflow.config import configure_liftover_sv
-    from core.dna_checks import is_multi_allelic, check_ref_fasta_seq, retrieve_chrom_size
+    from core.dna_checks import is_multi_allelic, check_ref_fasta_seq, prepare_chain_index, retrieve_chrom_size
     from workflow.liftover_process import write_the_lifted_vcf
 
     # Search for the liftoverSV VERSION
@@ -134,6 +134,9 @@ def main(argv):
         val = g_liftoverSV[key]
         if val == "":
             continue
+        if isinstance(val, list):
+            # e.g. several chain files
+            val = ", ".join(map(str, val))
         key = key.replace("_", "-")
         print(f"           --{key} {val}")
 
@@ -148,6 +151,10 @@ def main(argv):
 	###################################################################
     check_ref_fasta_seq(g_liftoverSV)
 
+	# Load (or compile and cache) the binary chain index
+	####################################################
+    prepare_chain_index(g_liftoverSV)
+
 	# Memorize the size of the chromosomes in the target build
 	#########################################################
     retrieve_chrom_size(g_liftoverSV)    
@@ -3,4 +3,32 @@ CHUNK_SIZE = 50000
 
 # Number of workers to use. 
 # The number of workers can't exceed the number of CPU cores (see def write_the_lifted_vcf)
-N_WORKERS = 8
\ No newline at end of file
+N_WORKERS = 8
+
+# Maximum number of lifted coordinates memorized by each worker (LRU cache of ChainLifter.lift)
+# 0 = no cache
+LIFT_CACHE_SIZE = 100000
+
+# Reference fetches (REF/ALT) of a chunk closer than this distance (bp) are read
+# in one window (see FastaExtractor.get_sequences / FastaExtractor.prefetch)
+FETCH_MERGE_DISTANCE = 4096
+
+# Maximum length (bp) of a merged window of reference fetches (a dense chunk would else
+# merge a whole contig into one window), a single longer fetch is still read in one window
+FETCH_MAX_WINDOW_SIZE = 1024 * 1024
+
+# Memory cap (MB) of the reference block cache of each worker (see BlockCacheReader)
+# 0 = no cache
+FASTA_CACHE_SIZE = 0
+
+# Size (bp) of the blocks of the reference block cache
+FASTA_CACHE_BLOCK_SIZE = 65536
+
+# Maximum number of chunks read from the input VCF but not yet written (memory bound of the streaming)
+# 0 = twice the number of workers
+MAX_INFLIGHT_CHUNKS = 0
+
+# Minimum size (bytes) of the result buffers returned by the workers through shared memory
+# instead of being pickled (see io_tools/shared_buffers.py)
+# 0 = never
+SHARED_BUFFER_MIN_SIZE = 4 * 1024 * 1024
\ No newline at end of file
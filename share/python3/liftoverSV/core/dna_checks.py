@@ -19,31 +19,49 @@ along with this program; If not, see <http://www.gnu.org/licenses/>.
 """
 
 import os
+import sys
 import subprocess
 import time
-from io_tools.file_utils import natural_sort_key, print_flush as print
+from io_tools.file_utils import natural_sort_key, open_any_text_file, print_flush as print
+from io_tools.chain_index import ChainIndex, load_or_build_chain_index
+from io_tools.fasta_readers import TwoBitReader
+
+
+def prepare_chain_index(g_liftoverSV) -> ChainIndex:
+    """
+    Open the binary index of the chain file(s) (cached in g_liftoverSV["index_dir"]),
+    or compile it from the .chain file(s) if it doesn't exist yet.
+    Several chain files are composed in the given order (one index from the first source build to the last target build).
+
+    The index is opened only once:
+    - Stores the ChainIndex in g_liftoverSV["chain_index"] (target sizes)
+    - Stores its path in g_liftoverSV["chain_index_path"] (memory-mapped by each worker),
+      None if the index could not be saved
+    Returns the ChainIndex.
+    """
+    print(f"[{time.strftime('%H:%M:%S')}] Loading the chain index")
+    index, index_path, built = load_or_build_chain_index(g_liftoverSV["chain"], g_liftoverSV["index_dir"])
+    if built:
+        chain_file_names = ", ".join(os.path.basename(chain_file) for chain_file in g_liftoverSV["chain"])
+        print(f"           (compiled from {chain_file_names})")
+    if index_path:
+        print(f"           {index_path}")
+    else:
+        print(f"[WARNING] The chain index could not be saved in {g_liftoverSV['index_dir']} (kept in memory only)")
+    g_liftoverSV["chain_index"] = index
+    g_liftoverSV["chain_index_path"] = index_path
+    return index
 
 
 def retrieve_chrom_size(g_liftoverSV):
     """
-    Read a .chain file to memorize chromosome sizes of the target build.
+    Read the chain index (see "prepare_chain_index") to memorize chromosome sizes of the target build.
     Stores in g_liftoverSV["size_chrom_target"][chrom]
     """
     # chain 20851231461 chr1 249250621 + 10000 249240621 chr1 248956422 + 10000 248946422 2
+    # => the target sizes (chr1 248956422) are stored in the chain index
     print(f"[{time.strftime('%H:%M:%S')}] Loading the size of the chromosomes of the target build")
-    chain_file_name = os.path.basename(g_liftoverSV["chain"])
-    print(f"           (parsing {chain_file_name})")
-    g_liftoverSV["size_chrom_target"] = {}
-    with open(g_liftoverSV["chain"], "r") as f:
-        for line in f:
-            if line.startswith("chain"):
-                split_line = line.strip().split()
-                # chrom_before_lift = split_line[2]
-                # size_before_lift = int(split_line[3])
-                # g_liftoverSV["size_before_lift"][chrom_before_lift] size_before_lift
-                chrom_target = split_line[7]
-                size_chrom_target = int(split_line[8])
-                g_liftoverSV["size_chrom_target"][chrom_target] = size_chrom_target
+    g_liftoverSV["size_chrom_target"] = g_liftoverSV["chain_index"].target_sizes()
   
     if g_liftoverSV["verbose"]:
         print("\n--verbose-- Size of the chromosomes of the target build:")
@@ -67,9 +85,9 @@ def check_ref_fasta_seq(g_liftoverSV):
 
     print(f"[{time.strftime('%H:%M:%S')}] Checking the ref_fasta_seq file")
 
-    # Check the chain file
+    # Check the chain file (the target build is the one of the last chain file)
     chain_status = None
-    with open(g_liftoverSV["chain"]) as f:
+    with open_any_text_file(g_liftoverSV["chain"][-1]) as f:
         for line in f:
             if line.startswith("chain"):
                 chain_status = "with" if "chr" in line.split()[7] else "without"
@@ -77,16 +95,24 @@ def check_ref_fasta_seq(g_liftoverSV):
 
     # Check the ref_fasta_seq file
     fasta_status = None
-    with open(g_liftoverSV["ref_fasta_seq"]) as f:
-        for line in f:
-            if line.startswith(">"):
-                fasta_status = "with" if "chr" in line else "without"
-                break
+    if g_liftoverSV["ref_fasta_seq"].lower().endswith(".2bit"):
+        # First sequence name of the .2bit index
+        twobit = TwoBitReader(g_liftoverSV["ref_fasta_seq"])
+        for chrom in twobit.lengths:
+            fasta_status = "with" if "chr" in chrom else "without"
+            break
+        twobit.close()
+    else:
+        with open_any_text_file(g_liftoverSV["ref_fasta_seq"]) as f:
+            for line in f:
+                if line.startswith(">"):
+                    fasta_status = "with" if "chr" in line else "without"
+                    break
 
     if chain_status != fasta_status:
         print("\nIncoherence:")
         print("############")
-        print(f"- chain: {g_liftoverSV['chain']}")
+        print(f"- chain: {g_liftoverSV['chain'][-1]}")
         print(f"     => Contig names of the target build: {chain_status} the 'chr' prefix")
         print(f"- ref_fasta_seq: {g_liftoverSV['ref_fasta_seq']}")
         print(f"     => Contig names of the target build: {fasta_status} the 'chr' prefix")
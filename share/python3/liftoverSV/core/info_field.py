@@ -0,0 +1,110 @@
+"""
+liftoverSV 0.3.1_beta
+=====================
+
+Copyright (C) 2024-current Veronique Geoffroy (veronique.geoffroy@inserm.fr)
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 3
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; If not, see <http://www.gnu.org/licenses/>.
+"""
+
+"""
+info_field.py
+
+Defines the InfoField class which gives access to the INFO column of a VCF line.
+
+Responsibilities:
+- Split the INFO column once into its "key=value" annotations
+- Read and update the annotations lifted by liftoverSV (END, SVLEN, CIPOS...)
+- Rebuild the INFO column only if an annotation was updated
+"""
+
+from typing import Any, Collection, Optional
+
+
+# INFO annotations read or updated during the liftover
+LIFTED_INFO_KEYS = frozenset({"END", "SVEND", "SVLEN", "SVSIZE", "CIPOS", "CIEND"})
+
+
+class InfoField:
+    """
+    INFO column of a VCF line, split once into its ";"-separated annotations.
+
+    Only the first occurrence (with a value) of the LIFTED_INFO_KEYS is indexed:
+    INFO keys are unique in a valid VCF.
+
+    Example:
+        info = InfoField("SVTYPE=DEL;END=5000;SVLEN=-2000")
+        end = info.first_integer("END", "SVEND")    # 5000
+        info.set("END", 6000)
+        info.to_string()                            # "SVTYPE=DEL;END=6000;SVLEN=-2000"
+        info.keys                                   # {"SVTYPE", "END", "SVLEN"}
+    """
+    __slots__ = ("info", "tokens", "index", "keys", "modified")
+
+    def __init__(self, info: str, indexed_keys: Collection[str] = LIFTED_INFO_KEYS):
+        self.info = info
+        self.tokens = info.split(";")
+        # key -> position of the annotation in "tokens"
+        self.index = {}
+        # Keys of the annotations ("KEY=" is kept as it is if the value is empty, like "KEY" for a flag)
+        self.keys = set()
+        self.modified = False
+
+        for i, token in enumerate(self.tokens):
+            key, _, value = token.partition("=")
+            if value:
+                self.keys.add(key)
+                if key in indexed_keys and key not in self.index:
+                    self.index[key] = i
+            else:
+                self.keys.add(token)
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Return the value of an indexed annotation, or None if absent.
+        """
+        i = self.index.get(key)
+        if i is None:
+            return None
+        return self.tokens[i].partition("=")[2]
+
+    def first_integer(self, *keys: str) -> Optional[int]:
+        """
+        Return the value of the first annotation (in the INFO column) among "keys"
+        that has a positive integer value (e.g. END or SVEND), or None.
+        """
+        found = [(self.index[key], key) for key in keys if key in self.index and self.get(key).isdecimal()]
+        if not found:
+            return None
+        return int(self.get(min(found)[1]))
+
+    def set(self, key: str, value: Any) -> bool:
+        """
+        Replace the value of an indexed annotation (nothing is done if absent).
+        Return True if the annotation was updated.
+        """
+        i = self.index.get(key)
+        if i is None:
+            return False
+        self.tokens[i] = f"{key}={value}"
+        self.modified = True
+        return True
+
+    def to_string(self) -> str:
+        """
+        Return the INFO column (rebuilt only if an annotation was updated).
+        """
+        if self.modified:
+            return ";".join(self.tokens)
+        return self.info
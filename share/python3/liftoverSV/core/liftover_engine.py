@@ -19,11 +19,35 @@ along with this program; If not, see <http://www.gnu.org/licenses/>.
 """
 
 import re
-from typing import Dict, Any, Tuple, Optional
+import numpy as np
+from typing import Dict, Any, List, Tuple, Optional
 from io_tools.file_utils import print_flush as print
 from io_tools.chain_lifter import ChainLifter
+from io_tools.chain_index import UNMAPPED, MAX_POSITION
 from io_tools.fasta_extractor import FastaExtractor
 from core.variant import Variant  
+from core.info_field import InfoField
+from core.svtype_normalization import Breakend
+from core.unmapped_reasons import UNMAPPED_REASONS, UnmappedVariant
+
+
+# ALT notations
+###############
+# Sequence notation: REF and ALT made of bases (also the single breakends, e.g. ".A" or ".TTTTG")
+SEQUENCE_NOTATION_PATTERN = re.compile(r"[acgtnACGTN.*]+")
+# Sequence composed only of "N"
+N_SEQUENCE_PATTERN = re.compile(r"N+")
+
+
+def parse_ci(value: Optional[str]) -> Optional[Tuple[int, int]]:
+    """
+    Return the first pair of values of INFO/CIPOS or INFO/CIEND (None if absent).
+    Raise ValueError or IndexError if the value is badly formatted.
+    """
+    if not value:
+        return None
+    ci_vals = [int(x) for x in value.split(",")]
+    return ci_vals[0], ci_vals[1]
 
 
 class LiftoverEngine:
@@ -35,11 +59,22 @@ class LiftoverEngine:
     and unmapped variants.
     """
 
-    def __init__(self, chain: ChainLifter, extractor: FastaExtractor, percent: int):
+    def __init__(self, chain: ChainLifter, extractor: FastaExtractor, percent: int, min_match: float = 0.0):
         self.chain = chain
         self.extractor = extractor
         self.percent = percent
+        # Minimum fraction of the POS-END interval covered by aligned blocks (DEL, DUP, INV), 0 = no filter
+        self.min_match = min_match
+        self.reset_counters()
 
+
+    def reset_counters(self):
+        """
+        Reset the statistics and the sets collected while lifting variants.
+
+        New objects are created (no clear()), so the ones previously returned
+        for a chunk are left untouched.
+        """
         # Counters for unmapped statistics
         self.n_mapped = 0
         self.n_unmapped = 0
@@ -56,20 +91,186 @@ class LiftoverEngine:
         self.S_SVlines_INFO, self.S_SVlines_FORMAT, self.S_SVlines_FILTER = set(), set(), set()
 
 
-    def lift_variant(self, v: Variant, g_liftoverSV: Dict[str, Any]) -> Tuple[Optional[str], Optional[str]]:
+    def prefetch_reference(self, variants: List[Variant]):
+        """
+        Read in coordinate order the lifted REF of a chunk of variants, before lifting them one by one
+        (in record order, the reference is read at random positions).
+        Only a hint: the REF of a variant dropped later is read for nothing, and
+        the sequences not prefetched are read by FastaExtractor.get_sequence as before.
+        """
+        fetches = []
+        for v in variants:
+            new_chrom, new_pos = self.chain.lift(v.chrom, v.pos)
+            if new_chrom is None:
+                continue
+            new_last_nt_chrom, new_last_nt_coord = self.chain.lift(v.chrom, v.pos + max(len(v.ref), 1) - 1)
+            if new_last_nt_chrom == new_chrom and new_last_nt_coord >= new_pos:
+                fetches.append((new_chrom, new_pos, new_last_nt_coord))
+        self.extractor.prefetch(fetches)
+
+
+    def lift_chunk(self, variants: List[Variant], g_liftoverSV: Dict[str, Any]) -> List[Tuple[Optional[str], Optional[UnmappedVariant]]]:
+        """
+        Lift a chunk of variants.
+
+        The angle-bracketed ALT with a 1-base REF (e.g. REF=A and ALT=<DEL>, most of the SV of
+        the Manta/Delly CNV callsets) are lifted column by column (see "_lift_symbolic_columns").
+        The other variants (sequence work, square-bracketed ALT...) are lifted one by one with "lift_variant".
+
+        Returns: for each variant (same order), the pair returned by "lift_variant"
+        """
+        results = [None] * len(variants)
+        rows = []
+        for i, v in enumerate(variants):
+            if v.alt.startswith("<") and len(v.ref) == 1 and v.ref not in ".*" and abs(v.pos) <= MAX_POSITION:
+                rows.append(i)
+            else:
+                results[i] = self.lift_variant(v, g_liftoverSV)
+
+        if rows:
+            self._lift_symbolic_columns(variants, rows, results, g_liftoverSV)
+        return results
+
+
+    def _lift_symbolic_columns(self, variants: List[Variant], rows: List[int], results: List[Any], g_liftoverSV: Dict[str, Any]):
+        """
+        Lift the angle-bracketed ALT with a 1-base REF (variants[i] for i in rows) with NumPy:
+        - POS and END are lifted with one vectorized chain lookup for each column ("lift_many")
+        - the drop cases 1-4 and the CIPOS/CIEND clamping are evaluated as array expressions
+        - only the REF base, the minimum match (-m) and the output line are done per variant
+
+        The results (lifted VCF line or reason) are stored in "results", with the same values as "lift_variant".
+        Variants with unexpected INFO values (e.g. badly formatted CIPOS) are lifted with "lift_variant".
+        """
+        # Columns of the INFO annotations
+        #################################
+        selected, infos, ends, cipos_list, ciend_list = [], [], [], [], []
+        for i in rows:
+            v = variants[i]
+            info = InfoField(v.lifted_info)
+            end = info.first_integer("END", "SVEND")
+            try:
+                cipos = parse_ci(info.get("CIPOS"))
+                ciend = parse_ci(info.get("CIEND"))
+            except (ValueError, IndexError):
+                results[i] = self.lift_variant(v, g_liftoverSV)
+                continue
+            values = [x for x in (end, *(cipos or ()), *(ciend or ())) if x is not None]
+            if (ciend and end is None) or any(abs(x) > MAX_POSITION for x in values):
+                # CIEND without END, or values out of the coordinates range
+                results[i] = self.lift_variant(v, g_liftoverSV)
+                continue
+            selected.append(i)
+            infos.append(info)
+            ends.append(end)
+            cipos_list.append(cipos or (0, 0))
+            ciend_list.append(ciend or (0, 0))
+        if not selected:
+            return
+
+        v_selected = [variants[i] for i in selected]
+        pos = np.array([v.pos for v in v_selected], dtype=np.int64)
+        has_end = np.array([end is not None for end in ends], dtype=bool)
+        end = np.array([end or 0 for end in ends], dtype=np.int64)
+        has_cipos = np.array([info.get("CIPOS") is not None for info in infos], dtype=bool)
+        has_ciend = np.array([info.get("CIEND") is not None for info in infos], dtype=bool)
+        cipos_1, cipos_2 = np.array(cipos_list, dtype=np.int64).reshape(-1, 2).T
+        ciend_1, ciend_2 = np.array(ciend_list, dtype=np.int64).reshape(-1, 2).T
+        is_sv = np.array([v.svtype not in ("TRA", "None") for v in v_selected], dtype=bool)
+
+        # Lift POS and END (the last NT of a 1-base REF is POS)
+        #######################################################
+        contig_ids = self.chain.contig_ids([v.chrom for v in v_selected])
+        new_ids, new_pos = self.chain.lift_many(contig_ids, pos)
+        new_end_ids, new_end = self.chain.lift_many(contig_ids, end)
+
+        # Drop cases (in the order of "lift_variant")
+        #############################################
+        svlen = end - pos
+        svlen_lifted = new_end - new_pos
+        drop = np.select(
+            [
+                new_ids == UNMAPPED,                            # Case1: POS not lifted
+                has_end & (new_end_ids == UNMAPPED),            # Case1: END not lifted
+                has_end & is_sv & (new_end_ids != new_ids),     # Case2: POS and END lifted on different chromosomes
+                has_end & (new_end < new_pos),                  # Case3: reversed coordinates order between POS and END
+                has_end & ((svlen_lifted < svlen * (1 - self.percent)) | (svlen_lifted > svlen * (1 + self.percent)))
+                                                                # Case4: the distance between POS and END changes significantly
+            ],
+            [1, 2, 3, 4, 5],
+            default=0
+        )
+
+        # CIPOS/CIEND clamping: POS-CIPOS > 0 and END+CIEND < chrom_length
+        ##################################################################
+        clamp_cipos = has_cipos & (cipos_1 <= 0) & (cipos_2 >= 0) & (new_pos + cipos_1 <= 0)
+        cipos_1 = np.where(clamp_cipos, 1 - new_pos, cipos_1)
+        chrom_size = self.chain.target_contig_sizes(new_ids)
+        clamp_ciend = has_ciend & (ciend_1 <= 0) & (ciend_2 >= 0) & (new_end + ciend_2 > chrom_size)
+        ciend_2 = np.where(clamp_ciend, chrom_size - new_end, ciend_2)
+
+        # Results of each variant
+        #########################
+        new_chroms = self.chain.target_contig_names(new_ids)
+        new_chroms_end = self.chain.target_contig_names(new_end_ids)
+        drop, new_pos, new_end, svlen_lifted = drop.tolist(), new_pos.tolist(), new_end.tolist(), svlen_lifted.tolist()
+        for k, v in enumerate(v_selected):
+            i = selected[k]
+            if drop[k] == 1:
+                results[i] = (None, self._unmapped(v, "POS_NOT_LIFTED"))
+                continue
+
+            v.lifted_chrom = new_chroms[k]
+            v.lifted_pos = new_pos[k]
+            v.ref_length = 1
+            v.last_nt_coord = v.pos
+            v.lifted_last_nt_chrom = v.lifted_chrom
+            v.lifted_last_nt_coord = v.lifted_pos
+            # Lift REF (ALT is kept as is)
+            self._lift_bracketed_alt_notation(v)
+
+            if drop[k]:
+                if drop[k] == 2:
+                    reason = self._unmapped(v, "END_NOT_LIFTED", v.chrom, ends[k])
+                elif drop[k] == 3:
+                    reason = self._unmapped(v, "END_CHROM", v.lifted_chrom, new_chroms_end[k])
+                elif drop[k] == 4:
+                    reason = self._unmapped(v, "END_REVERSED", v.lifted_pos, new_end[k])
+                else:
+                    reason = self._unmapped(v, "END_DISTANCE", new_end[k], v.lifted_pos, self.percent)
+                results[i] = (None, reason)
+                continue
+
+            info = infos[k]
+            if ends[k] is not None:
+                if self.min_match and v.svtype in {"DUP", "DEL", "INV"}:
+                    aligned_fraction = self.chain.aligned_coverage(v.chrom, v.pos, ends[k])[0]
+                    if aligned_fraction < self.min_match:
+                        # Case4: Too few positions between POS and END are in aligned blocks
+                        results[i] = (None, self._unmapped(v, "END_MIN_MATCH", aligned_fraction, self.min_match))
+                        continue
+                info.set("END", new_end[k])
+                self._lift_svlen(v, info, svlen_lifted[k])
+            if clamp_cipos[k]:
+                info.set("CIPOS", f"{cipos_1[k]},{cipos_2[k]}")
+            if clamp_ciend[k]:
+                info.set("CIEND", f"{ciend_1[k]},{ciend_2[k]}")
+
+            results[i] = (self._mapped_line(v, info), None)
+
+
+    def lift_variant(self, v: Variant, g_liftoverSV: Dict[str, Any]) -> Tuple[Optional[str], Optional[UnmappedVariant]]:
         """
         Lift a single Variant object. 
 
         Returns: 1) a "lifted VCF line" or None
-                 2) a reason for unmapped cases or None
+                 2) the reason for unmapped cases (UnmappedVariant) or None
         """
 
         # Lift POS
         new_chrom, new_pos = self.chain.lift(v.chrom, v.pos)
         if new_chrom is None:
-            self.n_unmapped += 1
-            self.case_counts["case1"] += 1
-            return None, f"{v.var_head}\tPOS not lifted"
+            return None, self._unmapped(v, "POS_NOT_LIFTED")
         v.lifted_chrom = new_chrom
         v.lifted_pos = new_pos
         
@@ -90,108 +291,87 @@ class LiftoverEngine:
             # REF contains '.' or '*' inside the sequence (not at the pos or end)
             # => not lifted, skip
             # NOTE: if ref="." then ref[1:-1]=""
-            self.n_unmapped += 1
-            self.case_counts["case5"] += 1
-            return None, f"{v.var_head}\tREF badly formatted (contains '.' or '*' inside the sequence)"
+            return None, self._unmapped(v, "REF_FORMAT")
         
         # Lift REF: Coordinates of the last NT
-        ref_clean = re.sub(r"[.*]", "", v.ref)
-        v.ref_length = len(ref_clean)
+        v.ref_length = len(v.ref) - v.ref.count(".") - v.ref.count("*")
         v.last_nt_coord = v.pos + v.ref_length - 1
-        new_last_nt_chrom, new_last_nt_coord = self.chain.lift(v.chrom, v.last_nt_coord)
+        if v.last_nt_coord == v.pos:
+            # 1-base REF (e.g. REF=A and ALT=<DEL>): the last NT is POS, already lifted
+            new_last_nt_chrom, new_last_nt_coord = new_chrom, new_pos
+        else:
+            new_last_nt_chrom, new_last_nt_coord = self.chain.lift(v.chrom, v.last_nt_coord)
         if new_last_nt_coord is None:
-            self.n_unmapped += 1
-            self.case_counts["case1"] += 1
-            return None, f"{v.var_head}\tLast NT of REF not lifted"
+            return None, self._unmapped(v, "LAST_NT_NOT_LIFTED")
         if new_last_nt_chrom != new_chrom:
-            self.n_unmapped += 1
-            self.case_counts["case2"] += 1
-            return None, f"{v.var_head}\tPOS and last NT of REF are lifted on different chromosomes ({new_chrom}, {new_last_nt_chrom})"
+            return None, self._unmapped(v, "LAST_NT_CHROM", new_chrom, new_last_nt_chrom)
         v.lifted_last_nt_chrom = new_last_nt_chrom
         v.lifted_last_nt_coord = new_last_nt_coord
 
-        if re.match(r"^[acgtnACGTN.*]+$", v.ref + v.alt):
-            # Sequence ALT notation
+        # Lift over REF and ALT with the handler of the ALT notation (chosen once)
+        if v.alt.startswith("<"):
+            # Angle-bracketed ALT notation: only REF is lifted
+            self._lift_bracketed_alt_notation(v)
+        elif v.breakend:
+            # Square-bracketed ALT notation (ALT already parsed in Variant.from_vcf_line)
+            self._lift_bracketed_alt_notation(v)
+            reason = self._lift_square_bracketed_alt_notation(v, v.breakend)
+            if reason:  
+                return None, reason
+        elif SEQUENCE_NOTATION_PATTERN.fullmatch(v.ref + v.alt):
+            # Sequence ALT notation (including the single breakends)
             reason = self._lift_sequence_alt_notation(v)
             if reason:
                 return None, reason
         else:
-            # Square-bracketed or angle-bracketed ALT notation
-            reason = self._lift_bracketed_alt_notation(v)
-            if reason:  
-                return None, reason
-            
-            # Lift over the square-bracketed ALT
-            match = re.match(r"([ACGTNacgtn.*]*)(\[|\])([^:]+):([0-9]+)(\[|\])([AC.*GTNacgtn.*]*)", v.alt)
-            if match:
-                # Square-bracketed ALT notation
-                reason = self._lift_square_bracketed_alt_notation(v, match)
-                if reason:  
-                    return None, reason
+            # Other ALT notations: kept as is, only REF is lifted
+            self._lift_bracketed_alt_notation(v)
+
 
 
+        # Split INFO once: the annotations are read and updated in "info",
+        # and the INFO column is rebuilt only once at the end
+        info = InfoField(v.lifted_info)
 
         # Lift over END/SVEND
         #####################
-        end = -10
-        match = re.search(r'(^END|;END|^SVEND|;SVEND)=(\d+)(;|$)', v.lifted_info)
-        if match:
-            end = int(match.group(2))
-            new_chrom_end, new_end = self.chain.lift(v.chrom, end)
+        end = info.first_integer("END", "SVEND")
+        svlen_lifted = None  # set if END is lifted
+        if end is not None:
+            new_chrom_end, new_end = self.chain.lift(v.chrom, end, cursor="END")
             if new_end is None:
                 # Case1: END not lifted, skip
-                self.n_unmapped += 1
-                self.case_counts["case1"] += 1
-                return None, f"{v.var_head}\tEND ({v.chrom}:{end}) not lifted"
+                return None, self._unmapped(v, "END_NOT_LIFTED", v.chrom, end)
                                 
             if v.lifted_chrom != new_chrom_end and v.svtype not in ("TRA", "None"):
                 # Case 2: lifted POS / ALT / END are on different chromosomes
-                self.n_unmapped += 1
-                self.case_counts["case2"] += 1
-                return None, f"{v.var_head}\tPOS and END are lifted on different chrom ({v.lifted_chrom} # {new_chrom_end})"
+                return None, self._unmapped(v, "END_CHROM", v.lifted_chrom, new_chrom_end)
 
             if new_end < v.lifted_pos:
                 # Case3: reversed coordinates order between POS and END during the lift
-                self.n_unmapped += 1
-                self.case_counts["case3"] += 1
-                return None, f"{v.var_head}\tlifted_POS ({v.lifted_pos}) > lifted_END ({new_end})"
+                return None, self._unmapped(v, "END_REVERSED", v.lifted_pos, new_end)
 
             svlen = end - v.pos
             svlen_lifted = new_end - v.lifted_pos
             if svlen_lifted < svlen * (1 - self.percent) or svlen_lifted > svlen * (1 + self.percent):
                 # Case4: The distance between the two lifted positions changes significantly (Default: difference between both SVLENs > 5%)
-                self.n_unmapped += 1
-                self.case_counts["case4"] += 1
-                return None, f"{v.var_head}\tthe distance between lifted_END ({new_end}) and lifted_POS ({v.lifted_pos}) changes significantly (svlen diff > {self.percent} %)"               
+                return None, self._unmapped(v, "END_DISTANCE", new_end, v.lifted_pos, self.percent)
+
+            if self.min_match and v.svtype in {"DUP", "DEL", "INV"}:
+                # Walk the chain blocks between POS and END only if needed (multi-Mb SV)
+                aligned_fraction = self.chain.aligned_coverage(v.chrom, v.pos, end)[0]
+                if aligned_fraction < self.min_match:
+                    # Case4: Too few positions between POS and END are in aligned blocks (Default: no filter)
+                    return None, self._unmapped(v, "END_MIN_MATCH", aligned_fraction, self.min_match)
 
             # Update info with the new END coordinate
-            info = re.sub(r'(^END|;END)=([^;]+)(;|$)', f'\\1={new_end}\\3', v.lifted_info)
-            v.lifted_info = info
+            info.set("END", new_end)
 
         # Lift over INFO/SVLEN, INFO/SVSIZE
         ###################################
-        # Set SVLEN/SVSIZE to "." for SV type not in "DUP", "DEL", "INV" or "INS" (=> TRA, CPX...)
-        if v.svtype not in {"DUP", "DEL", "INV", "INS"}: 
-            # not DEL, DUP, INV or INS
-            if 'svlen_lifted' in locals():
-                svlen_lifted = "."
+        if svlen_lifted is not None:
+            self._lift_svlen(v, info, svlen_lifted)
 
-        # Keep the same SVLEN/SVSIZE for INS (the number of the inserted bases remains the same)
-        if v.svtype == "INS":
-            if 'svlen_lifted' in locals():
-                del svlen_lifted
-
-        # Lift over INFO/SVLEN, INFO/SVSIZE
-        if 'svlen_lifted' in locals():
-            info = re.sub(r'(^SVLEN|;SVLEN)=(-)?(\d+)(;|$)', lambda m: f"{m.group(1)}={m.group(2) or ''}{svlen_lifted}{m.group(4)}", v.lifted_info)
-            v.lifted_info = info
-            info = re.sub(r'(^SVSIZE|;SVSIZE)=(-)?(\d+)(;|$)', lambda m: f"{m.group(1)}={m.group(2) or ''}{svlen_lifted}{m.group(4)}", v.lifted_info)
-            v.lifted_info = info
-
-        # Clean up
-        if 'svlen_lifted' in locals():
-            del svlen_lifted
-        
         # Lift over INFO/CIPOS, INFO/CIEND:
         ###################################
         #
@@ -205,39 +385,68 @@ class LiftoverEngine:
         #   => END+CIEND < chrom_length
 
         # CIPOS
-        m = re.search(r'(^CIPOS|;CIPOS)=([^;]+)(;|$)', v.lifted_info)
-        if m:
-            cipos_vals = [int(x) for x in m.group(2).split(",")]
-            cipos_1, cipos_2 = cipos_vals[0], cipos_vals[1]
+        cipos = parse_ci(info.get("CIPOS"))
+        if cipos:
+            cipos_1, cipos_2 = cipos
 
             if cipos_1 <= 0 and cipos_2 >= 0:
                 if v.lifted_pos + cipos_1 <= 0:
                     cipos_1 = -v.lifted_pos + 1
                     # Replace CIPOS in info
-                    info = re.sub(
-                        r'(^CIPOS|;CIPOS)=([^;]+)(;|$)',
-                        f"{m.group(1)}={cipos_1},{cipos_2}{m.group(3)}",
-                        v.lifted_info
-                    )
-                    v.lifted_info = info
+                    info.set("CIPOS", f"{cipos_1},{cipos_2}")
 
         # CIEND
-        m = re.search(r'(^CIEND|;CIEND)=([^;]+)(;|$)', v.lifted_info)
-        if m:
-            ciend_vals = [int(x) for x in m.group(2).split(",")]
-            ciend_1, ciend_2 = ciend_vals[0], ciend_vals[1]
+        ciend = parse_ci(info.get("CIEND"))
+        if ciend:
+            ciend_1, ciend_2 = ciend
 
             if ciend_1 <= 0 and ciend_2 >= 0:
                 chrom_size = g_liftoverSV['size_chrom_target'][v.lifted_chrom]
                 if new_end + ciend_2 > chrom_size:
                     ciend_2 = chrom_size - new_end
                     # Replace CIEND in info
-                    info = re.sub(
-                        r'(^CIEND|;CIEND)=([^;]+)(;|$)',
-                        f"{m.group(1)}={ciend_1},{ciend_2}{m.group(3)}",
-                        v.lifted_info
-                    )
-                    v.lifted_info = info
+                    info.set("CIEND", f"{ciend_1},{ciend_2}")
+
+        return self._mapped_line(v, info), None
+
+
+    def _unmapped(self, v: Variant, code: str, *params: Any) -> UnmappedVariant:
+        """
+        Count an unmapped variant and return its compact description
+        (the line of the unmapped file is rendered by the worker in the requested format, see core/unmapped_reasons.py)
+        """
+        case = UNMAPPED_REASONS[code][0]
+        self.n_unmapped += 1
+        self.case_counts[f"case{case}"] += 1
+        return UnmappedVariant(v.line_number, case, code, params)
+
+
+    def _lift_svlen(self, v: Variant, info: InfoField, svlen_lifted: int):
+        """
+        Lift over INFO/SVLEN, INFO/SVSIZE (svlen_lifted = lifted END - lifted POS)
+        """
+        if v.svtype == "INS":
+            # Keep the same SVLEN/SVSIZE for INS (the number of the inserted bases remains the same)
+            return
+        if v.svtype not in {"DUP", "DEL", "INV"}:
+            # Set SVLEN/SVSIZE to "." for SV type not in "DUP", "DEL", "INV" or "INS" (=> TRA, CPX...)
+            svlen_lifted = "."
+
+        for key in ("SVLEN", "SVSIZE"):
+            value = info.get(key)
+            if value is not None:
+                # Keep the sign of the value (negative SVLEN for a DEL)
+                sign = "-" if value.startswith("-") else ""
+                if value[len(sign):].isdecimal():
+                    info.set(key, f"{sign}{svlen_lifted}")
+
+
+    def _mapped_line(self, v: Variant, info: InfoField) -> str:
+        """
+        Memorize the annotations of a lifted variant and return its lifted VCF line.
+        """
+        # Rebuild the INFO column (only if an annotation was updated)
+        v.lifted_info = info.to_string()
 
         # Update S_lifted_contigs
         self.S_lifted_contigs.add(v.lifted_chrom)
@@ -246,8 +455,7 @@ class LiftoverEngine:
         self.S_SVlines_FILTER.update(v.filter.split(";"))
 
         # Memorize all the INFO annotations presents in the SV lines
-        infos_to_check = re.sub(r"=[^;]+", "", v.lifted_info)  
-        self.S_SVlines_INFO.update(infos_to_check.split(";"))
+        self.S_SVlines_INFO.update(info.keys)
     
         # Memorize all the FORMAT annotations presents in the SV lines
         if v.format:  # only if not empty, else add {''}
@@ -264,17 +472,17 @@ class LiftoverEngine:
             v.qual,
             v.filter,
             v.lifted_info,
-            v.format,
-            *v.samples
+            v.format
         ]
+        if v.samples:
+            # Raw sample columns (not split, see Variant.from_vcf_line)
+            fields.append(v.samples)
         vcf_line = "\t".join(map(str, fields))
 
-        return vcf_line, None 
-    
-
+        return vcf_line
 
 
-    def _lift_sequence_alt_notation(self, v: Variant) -> Optional[str]:
+    def _lift_sequence_alt_notation(self, v: Variant) -> Optional[UnmappedVariant]:
         """
         Handle sequence ALT notation (ACGTN, . et *)
 
@@ -283,25 +491,22 @@ class LiftoverEngine:
             v.lifted_alt
         Returns:
             None if the ALT notation is valid.
-            A string reason if unmapped.
+            The reason (UnmappedVariant) if unmapped.
         """
         
         if "." in v.alt[1:-1] or "*" in v.alt[1:-1]:
             # ALT contains '.' or '*' inside the sequence (not at the pos or end)
             # => not lifted       
-            self.n_unmapped += 1
-            self.case_counts["case5"] += 1
-            return f"{v.var_head}\tALT badly formatted (contains '.' or '*' inside the sequence)"
+            return self._unmapped(v, "ALT_FORMAT")
    
-        alt_clean = re.sub(r"[.*]", "", v.alt)
-        alt_length = len(alt_clean)
+        alt_length = len(v.alt) - v.alt.count(".") - v.alt.count("*")
 
-        if re.match(r"^N+$", v.ref) or v.ref == ".":
+        if N_SEQUENCE_PATTERN.fullmatch(v.ref) or v.ref == ".":
             # REF is composed only of "N" or REF = "."
             v.lifted_ref = v.ref
             v.lifted_alt = v.alt
 
-        elif re.match(r"^N+$", v.alt) or v.alt == ".":
+        elif N_SEQUENCE_PATTERN.fullmatch(v.alt) or v.alt == ".":
             # ALT is composed only of "N" or ALT = "."
             v.lifted_alt = v.alt
             new_reftmp = self.extractor.get_sequence(v.lifted_chrom, v.lifted_pos, v.lifted_last_nt_coord)
@@ -336,9 +541,7 @@ class LiftoverEngine:
                     v.lifted_alt = f"{insertion}{v.lifted_ref}"
 
                 else:
-                    self.n_unmapped += 1
-                    self.case_counts["case5"] += 1
-                    return f"{v.var_head}\tcomplex sequence notation. INS: REF not at the beginning of ALT"
+                    return self._unmapped(v, "INS_REF_NOT_FIRST")
                     
 
             elif v.ref_length > alt_length:
@@ -351,23 +554,17 @@ class LiftoverEngine:
                     last_nt_before_deletion = v.pos + v.ref_length - len(deletion) - 1
                     new_last_nt_before_deletion_chrom, new_last_nt_before_deletion = self.chain.lift(v.chrom, last_nt_before_deletion)
                     if new_last_nt_before_deletion is None:
-                        self.n_unmapped += 1
-                        self.case_counts["case1"] += 1
-                        return f"{v.var_head}\tLast NT before deletion not lifted (see REF and ALT) (DEL)"
+                        return self._unmapped(v, "DEL_LAST_NT_NOT_LIFTED")
 
                     if new_last_nt_before_deletion_chrom != v.lifted_chrom:
-                        self.n_unmapped += 1
-                        self.case_counts["case2"] += 1
-                        return f"{v.var_head}\tlifted_#CHROM ({new_chrom}) and lifted_last_NT_before_del ({new_last_nt_before_deletion_chrom}) are located on different chromosomes"
+                        return self._unmapped(v, "DEL_LAST_NT_CHROM", v.lifted_chrom, new_last_nt_before_deletion_chrom)
 
                     new_alt_tmp = self.extractor.get_sequence(v.lifted_chrom, v.lifted_pos, new_last_nt_before_deletion)
                     v.lifted_alt = re.sub(r"[^.*]+", new_alt_tmp, v.alt)
                     v.lifted_ref = f"{v.lifted_alt}{deletion}"
 
                 else:
-                    self.n_unmapped += 1
-                    self.case_counts["case5"] += 1
-                    return f"{v.var_head}\tcomplex sequence notation. DEL: ALT not at the beginning of REF"
+                    return self._unmapped(v, "DEL_ALT_NOT_FIRST")
 
             else:
                 # Equal lengths -> possible breakend or substitution
@@ -389,9 +586,7 @@ class LiftoverEngine:
                         v.lifted_ref = self.extractor.get_sequence(v.lifted_chrom, v.lifted_pos, v.lifted_last_nt_coord)
                         if v.ref != v.lifted_ref:
                             # The REF sequence differs from the original after liftover.
-                            self.n_unmapped += 1
-                            self.case_counts["case5"] += 1
-                            return f"{v.var_head}\tthe REF sequence differs from the original after liftover"
+                            return self._unmapped(v, "REF_DIFFERS")
                         else:
                             # The REF sequence is the same than the original after liftover
                             v.lifted_alt = v.alt
@@ -400,7 +595,7 @@ class LiftoverEngine:
         return None
                     
 
-    def _lift_bracketed_alt_notation(self, v: Variant) -> Optional[str]:
+    def _lift_bracketed_alt_notation(self, v: Variant):
         """
         - Square-bracketed notation ([chr:pos[ ou ]chr:pos])
         - Angle-bracketed notation (<SVTYPE>)
@@ -410,7 +605,7 @@ class LiftoverEngine:
         v.lifted_alt = v.alt ;# it will be updated later for square-bracketed ALT notation
 
         # Lift over the REF sequence (e.g. REF=A and ALT=<DEL>)
-        if re.fullmatch(r"N+", v.ref):
+        if N_SEQUENCE_PATTERN.fullmatch(v.ref):
             # REF is composed entirely of 'N'
             v.lifted_ref = v.ref
         elif v.ref == ".":
@@ -420,43 +615,33 @@ class LiftoverEngine:
             # Extract the sequence from the lifted genome coordinates
             v.lifted_ref = self.extractor.get_sequence(v.lifted_chrom, v.lifted_pos, int(v.lifted_last_nt_coord))
 
-    def _lift_square_bracketed_alt_notation(self, v: Variant, match: re.Match) -> Optional[str]:
+    def _lift_square_bracketed_alt_notation(self, v: Variant, breakend: Breakend) -> Optional[UnmappedVariant]:
         """
         Square-bracketed ALT notation ([chr:pos[ ou ]chr:pos])
         """
-        # match = re.match(r"([ACGTNacgtn.*]*)(\[|\])([^:]+):([0-9]+)(\[|\])([ACGTNacgtn.*]*)", v.alt)
-        base_left, bracket_left, chrom_alt, pos_alt, bracket_right, base_right = match.groups()
-        pos_alt = int(pos_alt)
+        base_left, bracket_left, chrom_alt, pos_alt, bracket_right, base_right = breakend
         
-        new_chrom_alt, new_pos_alt = self.chain.lift(chrom_alt, pos_alt)
+        new_chrom_alt, new_pos_alt = self.chain.lift(chrom_alt, pos_alt, cursor="ALT")
         if new_pos_alt is None:
             # Case1: not lifted
-            self.n_unmapped += 1
-            self.case_counts["case1"] += 1
-            return f"{v.var_head}\tALT not lifted"
+            return self._unmapped(v, "ALT_NOT_LIFTED")
 
         if v.svtype not in ("TRA", "None"):
             # Case 2: lifted POS / ALT are on different chromosomes
             if new_chrom_alt != v.lifted_chrom:
-                self.n_unmapped += 1
-                self.case_counts["case2"] += 1
-                return f"{v.var_head}\tifted_#CHROM ({v.lifted_chrom}) and lifted_alt_chrom ({new_chrom_alt}) are located on different chromosomes"
+                return self._unmapped(v, "ALT_CHROM", v.lifted_chrom, new_chrom_alt)
                 
 
             # Case3: reversed coordinates order between POS and ALT
             if (v.lifted_pos < new_pos_alt and v.pos > pos_alt) or (v.lifted_pos > new_pos_alt and v.pos < pos_alt):
-                self.n_unmapped += 1
-                self.case_counts["case3"] += 1
-                return f"{v.var_head}\tlifted_POS ({v.lifted_pos}) and lifted_ALT ({new_pos_alt}) are in reverse order relative to POS ({v.pos}) and ALT ({pos_alt})"
+                return self._unmapped(v, "ALT_REVERSED", v.lifted_pos, new_pos_alt, v.pos, pos_alt)
                 
 
             # Case4: The distance between the two lifted positions changes significantly (Default: difference between both SVLENs > 5%)
             svlen = abs(pos_alt - v.pos)
             svlen_lifted = abs(new_pos_alt - v.lifted_pos)
             if svlen_lifted < svlen * (1 - self.percent) or svlen_lifted > svlen * (1 + self.percent):
-                self.n_unmapped += 1
-                self.case_counts["case4"] += 1
-                return f"{v.var_head}\tthe distance between lifted_ALT ({new_pos_alt}) and lifted_POS ({v.lifted_pos}) changes significantly (svlen diff > {self.percent*100}%)"
+                return self._unmapped(v, "ALT_DISTANCE", new_pos_alt, v.lifted_pos, self.percent*100)
                 
     
         # Lift the sequence inside the square-bracketed ALT 
@@ -484,9 +669,7 @@ class LiftoverEngine:
 
         else:
             # Badly formatted ALT
-            self.n_unmapped += 1
-            self.case_counts["case5"] += 1
-            return f"{v.var_head}\tsquare-bracketed ALT notation ({v.alt}) badly formatted."
+            return self._unmapped(v, "BREAKEND_FORMAT", v.alt)
 
         # Update S_lifted_contigs
         self.S_lifted_contigs.add(new_chrom_alt)
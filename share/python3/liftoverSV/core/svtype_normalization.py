@@ -19,8 +19,42 @@ along with this program; If not, see <http://www.gnu.org/licenses/>.
 """
 
 import re
+from typing import NamedTuple, Optional, Tuple
 from io_tools.file_utils import print_flush as print
 
+
+class Breakend(NamedTuple):
+    """
+    Components of a square-bracketed ALT (e.g. "G]17:1584563]")
+    """
+    base_left: str
+    bracket_left: str
+    chrom: str
+    pos: int
+    bracket_right: str
+    base_right: str
+
+
+# Precompiled patterns
+######################
+# Angle-bracketed notation (searched in this order, the first match gives the SV type)
+DEL_PATTERN = re.compile(r"del|loss|<CN0>|<CN1>", re.IGNORECASE)
+DUP_PATTERN = re.compile(r"dup|gain|MCNV", re.IGNORECASE)
+CN_PATTERN = re.compile(r"<CN(\d+)>", re.IGNORECASE)
+INV_PATTERN = re.compile(r"inv", re.IGNORECASE)
+INS_PATTERN = re.compile(r"ins|MEI|alu|line|sva", re.IGNORECASE)  # "DEL_ALU" is set to "DEL", OK!
+TRA_PATTERN = re.compile(r"TRA|TRN")
+# Square-bracketed notation (the bases around the brackets can contain "." and "*")
+BREAKEND_PATTERN = re.compile(r"([ACGTNacgtn.*]*)(\[|\])([^:]+):([0-9]+)(\[|\])([ACGTNacgtn.*]*)")
+# Sequence notation (also used for the single breakends, e.g. ".TTCTCTCAT")
+SEQUENCE_PATTERN = re.compile(r"[acgtnACGTN.*]*")
+BASES_PATTERN = re.compile(r"[acgtnACGTN]*")
+
+# SV types of the angle-bracketed ALT (e.g. "<DEL>", "<DUP:TANDEM>", "<INS:ME:ALU>"): only a few different values in a VCF
+SYMBOLIC_SVTYPES = {}
+SYMBOLIC_SVTYPES_MAX_SIZE = 1024
+
+
 # =========================
 # Normalize SV type
 # =========================
@@ -30,94 +64,143 @@ from io_tools.file_utils import print_flush as print
 # - Type1: ref="G" and alt="ACTGCTAACGATCCGTTTGCTGCTAACGATCTAACGATCGGGATTGCTAACGATCTCGGG"
 # - Type2: angle-bracketed SV notation:   alt="<INS>", "<DEL>", ...
 # - Type3: squared-bracketed SV notation: alt="G]17:1584563]" or alt="G]chr17:1584563]"
-def normalize_svtype(chrom, pos, ref, alt):
-    """Determine the structural variant type: DEL, DUP, INS, INV, TRA, or None."""
-    svtype = "None"
+def classify_svtype(chrom: str, pos: int, ref: str, alt: str) -> Tuple[str, Optional[Breakend]]:
+    """
+    Determine the structural variant type: DEL, DUP, INS, INV, TRA, or None.
 
-    # angle-bracketed notation
-    if re.search(r"del|loss|<CN0>|<CN1>", alt, re.IGNORECASE):
-        svtype = "DEL"
-    elif re.search(r"dup|gain|MCNV", alt, re.IGNORECASE):
+    The ALT is parsed only once: the components of a square-bracketed ALT are returned
+    with the SV type (None for the other notations), so that they are not parsed again during the liftover.
+    """
+    if SEQUENCE_PATTERN.fullmatch(alt):
+        # Sequence notation: none of the angle-bracketed keywords can be found in ALT
+        if SEQUENCE_PATTERN.fullmatch(ref):
+            return _sequence_svtype(ref, alt), None
+        return "None", None
+
+    if alt.startswith("<"):
+        # Angle-bracketed notation: the SV type only depends on ALT
+        svtype = SYMBOLIC_SVTYPES.get(alt)
+        if svtype is None:
+            svtype = _symbolic_svtype(alt) or "None"
+            if len(SYMBOLIC_SVTYPES) < SYMBOLIC_SVTYPES_MAX_SIZE:
+                SYMBOLIC_SVTYPES[alt] = svtype
+        return svtype, None
+
+    m = BREAKEND_PATTERN.match(alt)
+    breakend = None
+    if m:
+        base_left, bracket_left, bracket_chrom, bracket_start, bracket_right, base_right = m.groups()
+        breakend = Breakend(base_left, bracket_left, bracket_chrom, int(bracket_start), bracket_right, base_right)
+
+    # The keywords are also searched in the other ALT (e.g. in the contig name of a square-bracketed ALT)
+    svtype = _symbolic_svtype(alt)
+    if svtype is not None:
+        return svtype, breakend
+
+    if breakend and "." not in breakend.base_left and "*" not in breakend.base_left:
+        # Square-bracketed notation: the "first mapped base" is made of [ACGTN] only
+        # (the bases after a "." or a "*" on the right are ignored)
+        return _breakend_svtype(chrom, pos, breakend), breakend
+
+    return "None", breakend
+
+
+def _symbolic_svtype(alt: str) -> Optional[str]:
+    """
+    SV type given by the keywords of an angle-bracketed ALT, or None if no keyword is found.
+    """
+    if DEL_PATTERN.search(alt):
+        return "DEL"
+    if DUP_PATTERN.search(alt):
+        return "DUP"
+    m = CN_PATTERN.search(alt)
+    if m:
+        if int(m.group(1)) > 1:
+            return "DUP"
+        return "None"
+    if INV_PATTERN.search(alt):
+        return "INV"
+    if INS_PATTERN.search(alt):
+        return "INS"
+    if TRA_PATTERN.search(alt):
+        return "TRA"
+    return None
+
+
+def _breakend_svtype(chrom: str, pos: int, breakend: Breakend) -> str:
+    """
+    SV type of a square-bracketed ALT
+    """
+    baseLeft, bracketLeft, inBracketChrom, inBracketStart, bracketRight, baseRight = breakend
+    baseRight = BASES_PATTERN.match(baseRight).group(0)
+    svtype = "None"
+    if chrom != inBracketChrom:
+        # TRA (chrom_#CHROM != chrom_ALT)
+        #################################
+        # Example:
+        # 17      198982  trn_no_mateid_a A       A]2:321681]
+        # 2       321681  trn_no_mateid_b G       G]17:198982]
+        svtype = "TRA"
+    elif len(baseLeft) > 1 or len(baseRight) > 1:
+        # INS ("first mapped base" is followed by the inserted sequence)
+        ################################################################
+        # Example:
+        # 13      53040041        ins_by_gridss   T       TATATATATACACAC[13:53040042[  => The "T" at the left corresponds to position 53040041
+        # 13      53040042        ins_by_gridss   A       ]13:53040041]ATATATATACACACA  => The "A" at the right corresponds to position 53040042
+        #                                                                               => The inserted sequence is "ATATATATACACAC"
+        svtype = "INS"
+    elif ((bracketRight == "]" and baseRight and inBracketStart > pos) or 
+          (bracketLeft == "[" and baseLeft and inBracketStart < pos)):
+        # DUP ("first mapped base" is NOT contained in the bracket: "N[" or "]N"; REF is outside of the brackets)
+        #########################################################################################################
+        # Example:
+        # 2       3000    breakend_dup_a  T       ]2:5000]T
+        # 2       5000    breakend_dup_b  T       T[2:3000[
         svtype = "DUP"
-    elif re.search(r"<CN(\d+)>", alt, re.IGNORECASE):
-        i = int(re.search(r"<CN(\d+)>", alt, re.IGNORECASE).group(1))
-        if i > 1:
-            svtype = "DUP"
-    elif re.search(r"inv", alt, re.IGNORECASE):
+    elif ((bracketRight == "]" and baseLeft) or (bracketRight == "[" and baseRight)):
+            # INV ("first mapped base" is contained in the bracket: "N]" or "[N")
+        #####################################################################
+        # Example 1:
+        # 3       2999    breakend_inv_1_a        T       T]3:5000]
+        # 3       5000    breakend_inv_1_b        T       [3:2999[T
+        # Example 2:
+        # 3       3000    breakend_inv_2_a        T       [3:5001[T
+        # 3       5001    breakend_inv_2_b        T       T]3:3000]
+        # Example 3:
+        # 3       3000    breakend_inv_3_a        T       [3:5001[T
+        # 3       5001    breakend_inv_3_b        T       [3:3000[T
         svtype = "INV"
-    elif re.search(r"ins|MEI|alu|line|sva", alt, re.IGNORECASE):  # "DEL_ALU" is set to "DEL", OK!
+    elif ((bracketRight == "[" and baseLeft and inBracketStart > pos) or
+          (bracketRight == "]" and baseRight and inBracketStart < pos)):
+        # DEL ("first mapped base" is NOT contained in the bracket: "N[" or "]N"; "first mapped base" is before the brackets
+        ####################################################################################################################
+        # Example:
+        # 12      3000    breakend_del_1_a        T       T[12:5000[
+        # 12      5000    breakend_del_1_b        T       ]12:3000]T
+        svtype = "DEL"
+    return svtype
+
+
+def _sequence_svtype(ref: str, alt: str) -> str:
+    """
+    SV type of a sequence ALT (INS or DEL, None if REF and ALT do not overlap)
+    """
+    svtype = "None"
+    # e.g.: ref="G" and alt="ACTGCTAACGATCCGTTTGCTGCTAACGATCTAACGATCGGGATTGCTAACGATCTCGGG"
+
+    # The GRIDSS author says that a . followed by bases refers to a single breakend where the reads cannot be uniquely mapped back.
+    # e.g.: 2       39564894        gridss28_45b    T       .TTCTCTCATAACAAACCATGACATCCAGTCATTTAATACAATATGTCTGGGGTGGCTGGGCCCCTTTTTT 246.24  LOW_QUAL        
+    refbis = ref.replace(".", "").replace("*", "")
+    altbis = alt.replace(".", "").replace("*", "")
+    variant_length = len(altbis) - len(refbis)
+    if variant_length > 0:
+        # insertion
         svtype = "INS"
-    elif re.search(r"TRA|TRN", alt):
-        svtype = "TRA"
+        if ref not in alt:
+            svtype = "None"
     else:
-        # Breakend notation [square brackets]?
-        pattern = r"([acgtnACGTN]*)(\[|\])([^\:]+):(\d+)(\[|\])([acgtnACGTN]*)"
-        m = re.match(pattern, alt)
-        if m:
-            # square-bracketed notation ]...]
-            baseLeft, bracketLeft, inBracketChrom, inBracketStart, bracketRight, baseRight = m.groups()
-            inBracketStart = int(inBracketStart)
-            if chrom != inBracketChrom:
-                # TRA (chrom_#CHROM != chrom_ALT)
-                #################################
-                # Example:
-                # 17      198982  trn_no_mateid_a A       A]2:321681]
-                # 2       321681  trn_no_mateid_b G       G]17:198982]
-                svtype = "TRA"
-            elif len(baseLeft) > 1 or len(baseRight) > 1:
-                # INS ("first mapped base" is followed by the inserted sequence)
-                ################################################################
-                # Example:
-                # 13      53040041        ins_by_gridss   T       TATATATATACACAC[13:53040042[  => The "T" at the left corresponds to position 53040041
-                # 13      53040042        ins_by_gridss   A       ]13:53040041]ATATATATACACACA  => The "A" at the right corresponds to position 53040042
-                #                                                                               => The inserted sequence is "ATATATATACACAC"
-                svtype = "INS"
-            elif ((bracketRight == "]" and baseRight and inBracketStart > pos) or 
-                  (bracketLeft == "[" and baseLeft and inBracketStart < pos)):
-                # DUP ("first mapped base" is NOT contained in the bracket: "N[" or "]N"; REF is outside of the brackets)
-                #########################################################################################################
-                # Example:
-                # 2       3000    breakend_dup_a  T       ]2:5000]T
-                # 2       5000    breakend_dup_b  T       T[2:3000[
-                svtype = "DUP"
-            elif ((bracketRight == "]" and baseLeft) or (bracketRight == "[" and baseRight)):
-                    # INV ("first mapped base" is contained in the bracket: "N]" or "[N")
-                #####################################################################
-                # Example 1:
-                # 3       2999    breakend_inv_1_a        T       T]3:5000]
-                # 3       5000    breakend_inv_1_b        T       [3:2999[T
-                # Example 2:
-                # 3       3000    breakend_inv_2_a        T       [3:5001[T
-                # 3       5001    breakend_inv_2_b        T       T]3:3000]
-                # Example 3:
-                # 3       3000    breakend_inv_3_a        T       [3:5001[T
-                # 3       5001    breakend_inv_3_b        T       [3:3000[T
-                svtype = "INV"
-            elif ((bracketRight == "[" and baseLeft and inBracketStart > pos) or
-                  (bracketRight == "]" and baseRight and inBracketStart < pos)):
-                # DEL ("first mapped base" is NOT contained in the bracket: "N[" or "]N"; "first mapped base" is before the brackets
-                ####################################################################################################################
-                # Example:
-                # 12      3000    breakend_del_1_a        T       T[12:5000[
-                # 12      5000    breakend_del_1_b        T       ]12:3000]T
-                svtype = "DEL"
-        elif re.fullmatch(r"[acgtnACGTN.*]*", ref+alt):
-            # e.g.: ref="G" and alt="ACTGCTAACGATCCGTTTGCTGCTAACGATCTAACGATCGGGATTGCTAACGATCTCGGG"
-        
-            # The GRIDSS author says that a . followed by bases refers to a single breakend where the reads cannot be uniquely mapped back.
-            # e.g.: 2       39564894        gridss28_45b    T       .TTCTCTCATAACAAACCATGACATCCAGTCATTTAATACAATATGTCTGGGGTGGCTGGGCCCCTTTTTT 246.24  LOW_QUAL        
-            refbis = re.sub(r"[.*]", "", ref)
-            altbis = re.sub(r"[.*]", "", alt)
-            variant_length = len(altbis) - len(refbis)
-            if variant_length > 0:
-                # insertion
-                svtype = "INS"
-                if ref not in alt:
-                    svtype = "None"
-            else:
-                # deletion
-                svtype = "DEL"
-                if alt not in ref:
-                    svtype = "None"
-
+        # deletion
+        svtype = "DEL"
+        if alt not in ref:
+            svtype = "None"
     return svtype
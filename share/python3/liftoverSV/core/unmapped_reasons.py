@@ -0,0 +1,92 @@
+"""
+liftoverSV 0.3.1_beta
+=====================
+
+Copyright (C) 2024-current Veronique Geoffroy (veronique.geoffroy@inserm.fr)
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 3
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; If not, see <http://www.gnu.org/licenses/>.
+"""
+
+"""
+unmapped_reasons.py
+
+Defines the reasons why a variant is not lifted (unmapped variants).
+
+Responsibilities:
+- Give a code, a drop case (1-5) and a message to each reason
+- Describe an unmapped variant with a compact record (UnmappedVariant) returned by the workers
+- Render the lines of the unmapped file (text or tsv format), in the worker that lifted the chunk
+"""
+
+from typing import NamedTuple, Tuple
+
+
+# Reason code -> (drop case, message)
+# The message is formatted with the parameters of the UnmappedVariant
+#####################################################################
+UNMAPPED_REASONS = {
+    # Case 1: One or more required positions fail to lift
+    "POS_NOT_LIFTED": (1, "POS not lifted"),
+    "LAST_NT_NOT_LIFTED": (1, "Last NT of REF not lifted"),
+    "END_NOT_LIFTED": (1, "END ({0}:{1}) not lifted"),
+    "ALT_NOT_LIFTED": (1, "ALT not lifted"),
+    "DEL_LAST_NT_NOT_LIFTED": (1, "Last NT before deletion not lifted (see REF and ALT) (DEL)"),
+    # Case 2: Lifted positions map to different chromosomes
+    "LAST_NT_CHROM": (2, "POS and last NT of REF are lifted on different chromosomes ({0}, {1})"),
+    "END_CHROM": (2, "POS and END are lifted on different chrom ({0} # {1})"),
+    "ALT_CHROM": (2, "ifted_#CHROM ({0}) and lifted_alt_chrom ({1}) are located on different chromosomes"),
+    "DEL_LAST_NT_CHROM": (2, "lifted_#CHROM ({0}) and lifted_last_NT_before_del ({1}) are located on different chromosomes"),
+    # Case 3: Reversed order between lifted positions
+    "END_REVERSED": (3, "lifted_POS ({0}) > lifted_END ({1})"),
+    "ALT_REVERSED": (3, "lifted_POS ({0}) and lifted_ALT ({1}) are in reverse order relative to POS ({2}) and ALT ({3})"),
+    # Case 4: Significant change in distance after liftover
+    "END_DISTANCE": (4, "the distance between lifted_END ({0}) and lifted_POS ({1}) changes significantly (svlen diff > {2} %)"),
+    "END_MIN_MATCH": (4, "only {0:.4f} of the positions between POS and END are lifted (min match = {1})"),
+    "ALT_DISTANCE": (4, "the distance between lifted_ALT ({0}) and lifted_POS ({1}) changes significantly (svlen diff > {2}%)"),
+    # Case 5: Complex or inconsistent REF/ALT sequences
+    "REF_FORMAT": (5, "REF badly formatted (contains '.' or '*' inside the sequence)"),
+    "ALT_FORMAT": (5, "ALT badly formatted (contains '.' or '*' inside the sequence)"),
+    "INS_REF_NOT_FIRST": (5, "complex sequence notation. INS: REF not at the beginning of ALT"),
+    "DEL_ALT_NOT_FIRST": (5, "complex sequence notation. DEL: ALT not at the beginning of REF"),
+    "REF_DIFFERS": (5, "the REF sequence differs from the original after liftover"),
+    "BREAKEND_FORMAT": (5, "square-bracketed ALT notation ({0}) badly formatted."),
+}
+
+
+class UnmappedVariant(NamedTuple):
+    """
+    Compact description of an unmapped variant returned by LiftoverEngine
+    (the message is only formatted if the unmapped file is written in "text" format)
+    """
+    line_number: int
+    case: int
+    code: str
+    params: Tuple
+
+
+def render_unmapped(var_head: str, unmapped: UnmappedVariant) -> str:
+    """
+    Line of the unmapped file in "text" format: the first 7 columns of the VCF line and the message
+    """
+    message = UNMAPPED_REASONS[unmapped.code][1].format(*unmapped.params)
+    return f"{var_head}\t{message}"
+
+
+def render_unmapped_tsv(unmapped: UnmappedVariant) -> str:
+    """
+    Line of the unmapped file in "tsv" format: line number, case, reason code and parameters (comma-separated).
+    Always 4 columns: the parameters column is "." for a reason without parameters.
+    """
+    params = ",".join(map(str, unmapped.params)) if unmapped.params else "."
+    return f"{unmapped.line_number}\tcase{unmapped.case}\t{unmapped.code}\t{params}"
@@ -29,58 +29,79 @@ Responsibilities:
 - Provide a method to reconstruct a VCF line after lifting or modifications
 """
 
-from dataclasses import dataclass
-from typing import List, Optional
-from core.svtype_normalization import normalize_svtype
+from typing import Optional
+from core.svtype_normalization import Breakend, classify_svtype
 from io_tools.file_utils import print_flush as print
 
 
-
-@dataclass
 class Variant:
     """
     Variant represents a single variant (SV or SNV) from a VCF file.
 
+    One Variant is created for each line of the input VCF: the attributes are stored
+    in __slots__ (no per-instance __dict__) and the fields of the line are shared, not copied
+    (e.g. "lifted_info" is "info" until it is updated).
+
     Attributes:
         chrom (str): #CHROM
         pos (int): POS (1-based)
-        id (str): ID (auto-generated if missing)
+        id (str): ID (as in the input VCF)
         ref (str): REF
         alt (str): ALT
         qual (str): QUAL
         filter (str): FILTER
         info (str): INFO 
         format (str): FORMAT (optional)
-        samples (List[str]): Genotype/sample fields (optional)
+        samples (str): Genotype/sample columns (optional), kept as the raw tab-separated
+                       tail of the line: they are never modified by the liftover
         line_number (int): Line number in the input VCF (used for auto-generated ID)
+        svtype (str): SV type (see classify_svtype)
+        breakend (Breakend): Components of a square-bracketed ALT (None for the other ALT notations)
     """
-    chrom: str
-    pos: int
-    id: str
-    ref: str
-    alt: str
-    qual: str
-    filter: str
-    info: str
-    var_head: str  
-    svtype: Optional[str]
-    format: str = ""
-    ref_length: Optional[int] = None
-    last_nt_coord: Optional[int] = None   
-    samples: Optional[List[str]] = None
-
-    line_number: Optional[int] = None
-
-
-    # Lifted fields (initially unknown)
-    lifted_chrom: Optional[str] = None
-    lifted_pos: Optional[int] = None
-    lifted_id: Optional[str] = None
-    lifted_ref: Optional[str] = None
-    lifted_last_nt_chrom: Optional[int] = None
-    lifted_last_nt_coord: Optional[int] = None
-    lifted_alt: Optional[str] = None
-    lifted_info: Optional[str] = None
+    __slots__ = (
+        "chrom", "pos", "id", "ref", "alt", "qual", "filter", "info", "format", "samples",
+        "line_number", "svtype", "breakend", "ref_length", "last_nt_coord",
+        # Lifted fields
+        "lifted_chrom", "lifted_pos", "lifted_id", "lifted_ref", "lifted_last_nt_chrom",
+        "lifted_last_nt_coord", "lifted_alt", "lifted_info"
+    )
+
+    def __init__(self, chrom: str, pos: int, id: str, ref: str, alt: str, qual: str, filter: str, info: str,
+                 format: str = "", samples: str = "", line_number: Optional[int] = None,
+                 svtype: Optional[str] = None, breakend: Optional[Breakend] = None, lifted_id: Optional[str] = None):
+        self.chrom = chrom
+        self.pos = pos
+        self.id = id
+        self.ref = ref
+        self.alt = alt
+        self.qual = qual
+        self.filter = filter
+        self.info = info
+        self.format = format
+        self.samples = samples
+        self.line_number = line_number
+        self.svtype = svtype
+        self.breakend = breakend
+        self.ref_length = None
+        self.last_nt_coord = None
+
+        # Lifted fields (initially unknown)
+        self.lifted_chrom = None
+        self.lifted_pos = None
+        self.lifted_id = lifted_id
+        self.lifted_ref = None
+        self.lifted_last_nt_chrom = None
+        self.lifted_last_nt_coord = None
+        self.lifted_alt = None
+        self.lifted_info = info  # will be updated if needed
+
+    @property
+    def var_head(self) -> str:
+        """
+        First 7 columns of the input VCF line (#CHROM to FILTER), as written in the unmapped file.
+        Only built for the variants that are not lifted.
+        """
+        return "\t".join((self.chrom, str(self.pos), self.id, self.ref, self.alt, self.qual, self.filter))
 
     @classmethod
     def from_vcf_line(cls, line: str, line_number: int):
@@ -99,7 +120,10 @@ class Variant:
             - If the ID field in VCF is ".", it is replaced by "lifted_from_l_<line_number>"
             - Handles optional FORMAT and sample columns
         """
-        fields = line.rstrip().split("\t")  # Remove trailing newline and split by tab
+        # Remove trailing newline and split by tab.
+        # Only the first 9 columns are split: the sample columns (can be thousands in a
+        # multi-sample VCF) are carried as one untouched string.
+        fields = line.rstrip().split("\t", 9)
 
         chrom = fields[0]  
         pos = int(fields[1])  # 1-based position
@@ -119,18 +143,16 @@ class Variant:
         qual = fields[5]  # QUAL
         filter = fields[6]  # FILTER
         info = fields[7]  # INFO
-        lifted_info = info # will be updated if needed
-
-        var_head = "\t".join(fields[:7])
 
-        svtype = normalize_svtype(chrom, pos, ref, alt)
+        # SV type and components of a square-bracketed ALT (ALT parsed only once)
+        svtype, breakend = classify_svtype(chrom, pos, ref, alt)
 
         # Optional FORMAT and sample columns
         ####################################
         # 'FORMAT' column from VCF is stored in 'fmt' to avoid conflict
         # with Python's built-in 'format' function  
         fmt = fields[8] if len(fields) > 8 else ""  # FORMAT field
-        samples = fields[9:] if len(fields) > 9 else []  # Sample columns
+        samples = fields[9] if len(fields) > 9 else ""  # Sample columns (raw tail of the line)
 
         return cls(
             chrom=chrom,
@@ -145,9 +167,8 @@ class Variant:
             format=fmt,
             samples=samples,
             line_number=line_number,
-            var_head=var_head,
             svtype=svtype,
-            lifted_info=lifted_info
+            breakend=breakend
         )
 
     def to_vcf_line(self) -> str:
@@ -167,18 +188,18 @@ class Variant:
             self.lifted_id,
             self.lifted_ref,
             self.lifted_alt,
-            self.lifted_qual,
-            self.lifted_filter,
+            self.qual,
+            self.filter,
             self.lifted_info
         ]
 
         # Add FORMAT column if exists
-        if self.lifted_format:
-            fields.append(self.lifted_format)
+        if self.format:
+            fields.append(self.format)
 
-        # Add sample columns if exists
+        # Add sample columns if exists (passed through untouched)
         if self.samples:
-            fields.extend(self.lifted_samples)
+            fields.append(self.samples)
 
         # Join all fields with tab characters
         return "\t".join(fields)
@@ -97,7 +97,33 @@ class BatchWriter:
                 f.write("\n".join(self._buffer) + "\n")
 
         self._buffer.clear()
-    
+
+    def write_bytes(self, data, n_lines: int):
+        """
+        Write a block of already joined lines (bytes-like, each line ending with a newline)
+        with a single write call, after the buffered lines.
+
+        Args:
+            data (bytes | memoryview): Encoded lines.
+            n_lines (int): Number of lines in data.
+        """
+        if self._closed:
+            raise ValueError("Cannot write to closed BatchWriter.")
+        if not n_lines:
+            return
+
+        # Keep the order of the lines
+        self.flush()
+
+        if self._is_gzip:
+            with gzip.open(self.filepath, "ab") as f:
+                f.write(data)
+        else:
+            with open(self.filepath, "ab") as f:
+                f.write(data)
+
+        self._lines_written += n_lines
+
 
     def close(self):
         """Flush remaining lines to disk."""
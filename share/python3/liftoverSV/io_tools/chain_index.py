@@ -0,0 +1,618 @@
+"""
+liftoverSV 0.3.1_beta
+=====================
+
+Copyright (C) 2024-current Veronique Geoffroy (veronique.geoffroy@inserm.fr)
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 3
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import json
+import heapq
+import shutil
+import hashlib
+import tempfile
+import numpy as np
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from io_tools.file_utils import open_any_text_file
+
+
+# Format of a chain file (https://genome.ucsc.edu/goldenPath/help/chain.html):
+##############################################################################
+# chain score tName tSize tStrand tStart tEnd qName qSize qStrand qStart qEnd id
+# size dt dq
+# ...
+# size
+#
+# In a ".over.chain" file:
+# - "t" (tName, tStart...) is the SOURCE build (before the lift), always on the "+" strand
+# - "q" (qName, qStart...) is the TARGET build (after the lift), on the "+" or "-" strand
+#   For the "-" strand, qStart/qEnd are given on the reverse-complemented target contig
+#
+# Each "size" line is an ungapped aligned block.
+# "dt" and "dq" are the gaps (in the source and in the target) before the next block.
+
+# Positions are stored in a single sorted int64 key: (source contig id << 32) | source start
+# => one searchsorted() call finds the block of any (contig, position)
+CONTIG_SHIFT = 32
+MAX_POSITION = (1 << CONTIG_SHIFT) - 1
+
+# Sentinel value used by the batch methods for unknown contigs and unmapped positions
+UNMAPPED = -1
+
+# Binary index saved on disk (see "ChainIndex.save" and "ChainIndex.load"):
+# <index_dir>/<chain basename(s)>.<checksum>.v<INDEX_FORMAT_VERSION>.lsvidx/
+#     contigs.json      contig names tables
+#     <array>.npy       one file per array (opened with np.load(mmap_mode="r"))
+INDEX_FORMAT_VERSION = 1
+INDEX_ARRAYS = ("src_sizes", "tgt_sizes", "src_key", "length", "tgt_start", "tgt_contig", "tgt_strand")
+
+
+class ChainIndex:
+    """
+    Interval-array index of the aligned blocks of a chain file.
+
+    All the blocks are stored in flat NumPy arrays, sorted by (source contig, source start):
+        src_key     (int64): (source contig id << 32) | source start (0-based)
+        length      (int64): length of the block
+        tgt_start   (int64): target start of the block (0-based, on the chain strand)
+        tgt_contig  (int32): target contig id
+        tgt_strand  (int8) : +1 or -1
+
+    Overlapping blocks (i.e. a source position covered by several chains) are resolved
+    when the index is built: as with the UCSC liftOver/pyliftover, the chain with
+    the highest score is kept (the first one in the file if the scores are equal).
+    => each source position is covered by at most 1 block in the index.
+
+    Usage:
+        index = ChainIndex.from_chain_file("hg19ToHg38.over.chain")
+        new_chrom, new_bed_pos = index.convert_coordinate("chr1", 12344)
+    """
+
+    def __init__(self, src_names: List[str], src_sizes: np.ndarray,
+                 tgt_names: List[str], tgt_sizes: np.ndarray,
+                 src_key: np.ndarray, length: np.ndarray,
+                 tgt_start: np.ndarray, tgt_contig: np.ndarray, tgt_strand: np.ndarray):
+        # Contig names tables (id <=> name)
+        self.src_names = list(src_names)
+        self.tgt_names = list(tgt_names)
+        self.src_ids: Dict[str, int] = {name: i for i, name in enumerate(self.src_names)}
+        self.tgt_ids: Dict[str, int] = {name: i for i, name in enumerate(self.tgt_names)}
+        self.src_sizes = src_sizes
+        self.tgt_sizes = tgt_sizes
+
+        # Blocks arrays
+        self.src_key = src_key
+        self.length = length
+        self.tgt_start = tgt_start
+        self.tgt_contig = tgt_contig
+        self.tgt_strand = tgt_strand
+
+
+    @classmethod
+    def from_chain_file(cls, chain_file: str) -> "ChainIndex":
+        """
+        Parse a chain file (.chain or .chain.gz) and build the index.
+        """
+        src_ids, src_names, src_sizes = {}, [], []
+        tgt_ids, tgt_names, tgt_sizes = {}, [], []
+
+        # One value per block
+        b_src_contig, b_src_start, b_length = [], [], []
+        b_tgt_contig, b_tgt_start, b_strand = [], [], []
+        b_score, b_order = [], []
+
+        n_chain = 0
+        with open_any_text_file(chain_file) as f:
+            for line in f:
+                if line.startswith("chain"):
+                    # chain 20851231461 chr1 249250621 + 10000 249240621 chr1 248956422 + 10000 248946422 2
+                    fields = line.split()
+                    if len(fields) not in (12, 13):
+                        raise ValueError(f"Invalid chain format in {chain_file}: {line.strip()}")
+                    score = int(fields[1])
+                    src_name, src_size = fields[2], int(fields[3])
+                    tgt_name, tgt_size = fields[7], int(fields[8])
+                    strand = 1 if fields[9] == "+" else -1
+                    if src_name not in src_ids:
+                        src_ids[src_name] = len(src_names)
+                        src_names.append(src_name)
+                        src_sizes.append(src_size)
+                    if tgt_name not in tgt_ids:
+                        tgt_ids[tgt_name] = len(tgt_names)
+                        tgt_names.append(tgt_name)
+                        tgt_sizes.append(tgt_size)
+                    src_id, tgt_id = src_ids[src_name], tgt_ids[tgt_name]
+                    s_from, t_from = int(fields[5]), int(fields[10])
+                    n_chain += 1
+                    continue
+
+                fields = line.split()
+                if not fields or line.startswith("#"):
+                    continue
+
+                size = int(fields[0])
+                # Zero-size blocks cover no position
+                if size > 0:
+                    b_src_contig.append(src_id)
+                    b_src_start.append(s_from)
+                    b_length.append(size)
+                    b_tgt_contig.append(tgt_id)
+                    b_tgt_start.append(t_from)
+                    b_strand.append(strand)
+                    b_score.append(score)
+                    b_order.append(n_chain)
+                if len(fields) == 3:
+                    s_from += size + int(fields[1])
+                    t_from += size + int(fields[2])
+
+        src_contig = np.array(b_src_contig, dtype=np.int64)
+        src_start = np.array(b_src_start, dtype=np.int64)
+        length = np.array(b_length, dtype=np.int64)
+        tgt_contig = np.array(b_tgt_contig, dtype=np.int32)
+        tgt_start = np.array(b_tgt_start, dtype=np.int64)
+        tgt_strand = np.array(b_strand, dtype=np.int8)
+        score = np.array(b_score, dtype=np.int64)
+        order = np.array(b_order, dtype=np.int64)
+
+        # Sort the blocks by (source contig, source start)
+        src_key = (src_contig << CONTIG_SHIFT) | src_start
+        sort_idx = np.argsort(src_key, kind="stable")
+        arrays = [a[sort_idx] for a in (src_key, length, tgt_start, tgt_contig, tgt_strand, score, order)]
+        src_key, length, tgt_start, tgt_contig, tgt_strand = _resolve_overlaps(*arrays)
+
+        return cls(src_names, np.array(src_sizes, dtype=np.int64),
+                   tgt_names, np.array(tgt_sizes, dtype=np.int64),
+                   src_key, length, tgt_start, tgt_contig, tgt_strand)
+
+
+    @classmethod
+    def from_chain_files(cls, chain_files: Sequence[str]) -> "ChainIndex":
+        """
+        Parse several chain files and compose them in the given order
+        (e.g. hg18ToHg19 then hg19ToHg38 => one index from hg18 to hg38).
+        """
+        index = cls.from_chain_file(chain_files[0])
+        for chain_file in chain_files[1:]:
+            index = index.compose(cls.from_chain_file(chain_file))
+        return index
+
+    def compose(self, other: "ChainIndex") -> "ChainIndex":
+        """
+        Compose two indexes: self (A to B) then other (B to C) gives one index from A to C.
+
+        Each block of self is cut by the blocks of other overlapping its image in B.
+        A position is lifted by the composed index if and only if it is lifted by self and
+        its lifted position is lifted by other, to the same final position as two successive lifts.
+        """
+        # Contig of B of each block, as a source contig id of other
+        mid_ids = np.array([other.src_ids.get(name, UNMAPPED) for name in self.tgt_names], dtype=np.int64)
+        a_mid = mid_ids[self.tgt_contig] if len(mid_ids) else np.zeros(0, dtype=np.int64)
+        a_strand = self.tgt_strand.astype(np.int64)
+        # Image of each block in B, on the "+" strand: [mid_start, mid_start + length)
+        a_mid_size = self.tgt_sizes[self.tgt_contig]
+        mid_start = np.where(a_strand > 0, self.tgt_start, a_mid_size - self.tgt_start - self.length)
+        mid_key = (a_mid << CONTIG_SHIFT) | mid_start
+
+        # Blocks of other overlapping each image (contiguous range [first, last] in other.src_key)
+        a_idx = np.nonzero(a_mid != UNMAPPED)[0]
+        first = np.maximum(np.searchsorted(other.src_key, mid_key[a_idx], side="right") - 1, 0)
+        last = np.searchsorted(other.src_key, mid_key[a_idx] + self.length[a_idx] - 1, side="right") - 1
+        count = np.maximum(last - first + 1, 0)
+
+        # One row per (block of self, block of other) pair
+        pair_a = np.repeat(a_idx, count)
+        pair_b = np.repeat(first, count) + np.arange(count.sum()) - np.repeat(np.cumsum(count) - count, count)
+
+        # Overlap in B (keys of other)
+        overlap_start = np.maximum(mid_key[pair_a], other.src_key[pair_b])
+        overlap_end = np.minimum(mid_key[pair_a] + self.length[pair_a], other.src_key[pair_b] + other.length[pair_b])
+        overlapping = overlap_end > overlap_start
+        pair_a, pair_b = pair_a[overlapping], pair_b[overlapping]
+        overlap_start, overlap_end = overlap_start[overlapping], overlap_end[overlapping]
+
+        # Source start of each piece (in A): a "-" strand block runs backwards in B
+        forward = a_strand[pair_a] > 0
+        offset = np.where(forward, overlap_start - mid_key[pair_a], mid_key[pair_a] + self.length[pair_a] - overlap_end)
+        src_key = self.src_key[pair_a] + offset
+        length = overlap_end - overlap_start
+
+        # Target start of each piece (in C), for the position of B lifted from the piece start
+        mid_first = np.where(forward, overlap_start, overlap_end - 1)
+        b_tgt_start = other.tgt_start[pair_b] + mid_first - other.src_key[pair_b]
+        tgt_contig = other.tgt_contig[pair_b]
+        b_tgt_size = other.tgt_sizes[tgt_contig]
+        tgt_start = np.where(forward, b_tgt_start, b_tgt_size - 1 - b_tgt_start)
+        tgt_strand = (a_strand[pair_a] * other.tgt_strand[pair_b]).astype(np.int8)
+
+        # The blocks of self (and of other) don't overlap => the pieces don't overlap either
+        sort_idx = np.argsort(src_key, kind="stable")
+        return ChainIndex(self.src_names, np.array(self.src_sizes), other.tgt_names, np.array(other.tgt_sizes),
+                          src_key[sort_idx], length[sort_idx], tgt_start[sort_idx],
+                          tgt_contig[sort_idx].astype(np.int32), tgt_strand[sort_idx])
+
+    def source_key(self, src_chrom: str, bed_pos: int) -> Optional[int]:
+        """
+        Return the sort key (contig id << CONTIG_SHIFT | position) of a 0-based source position,
+        or None if the contig is not in the chain file (or the position is out of range).
+        """
+        src_id = self.src_ids.get(src_chrom)
+        if src_id is None or bed_pos < 0 or bed_pos > MAX_POSITION:
+            return None
+        return (src_id << CONTIG_SHIFT) | bed_pos
+
+    def find_block(self, key: int, from_block: int = -1) -> int:
+        """
+        Return the index of the last block starting at or before "key" (-1 if none).
+
+        from_block: index of a block starting at or before "key" (e.g. the block found for the previous
+                    coordinate of a sorted input). The search then gallops forward from this block
+                    (finger search, O(log distance)) instead of searching all the blocks.
+                    If "key" is before this block (unsorted input), falls back to a full binary search.
+        """
+        src_key = self.src_key
+        if 0 <= from_block and src_key[from_block] <= key:
+            n = len(src_key)
+            lo = from_block
+            step = 1
+            hi = lo + 1
+            while hi < n and src_key[hi] <= key:
+                lo = hi
+                step <<= 1
+                hi = lo + step
+            if hi == lo + 1:
+                # No block between the start block and "key"
+                return lo
+            hi = min(hi, n)
+            return lo + int(np.searchsorted(src_key[lo:hi], key, side="right")) - 1
+        return int(np.searchsorted(src_key, key, side="right")) - 1
+
+    def block(self, i: int) -> Tuple[int, int, str, int, int, int]:
+        """
+        Return the block i as Python values:
+        (start key, end key, target contig, target start, target strand, target contig size)
+        """
+        tgt_id = int(self.tgt_contig[i])
+        start_key = int(self.src_key[i])
+        return (start_key, start_key + int(self.length[i]), self.tgt_names[tgt_id], int(self.tgt_start[i]),
+                int(self.tgt_strand[i]), int(self.tgt_sizes[tgt_id]))
+
+    def aligned_coverage(self, start_key: int, end_key: int, from_block: int = -1) -> Tuple[int, List[str]]:
+        """
+        Walk once the blocks between two keys of a same source contig (both included).
+
+        from_block: see "find_block"
+
+        Returns:
+            (number of positions covered by an aligned block, target contigs of these blocks in source order)
+        """
+        i_first = max(self.find_block(start_key, from_block), 0)
+        i_last = self.find_block(end_key, i_first)
+        if i_last < i_first:
+            return 0, []
+
+        if i_first == i_last:
+            # Both keys in the same block (or gap): no array operation needed
+            block_start, block_end, tgt_name = self.block(i_first)[:3]
+            n_aligned = min(block_end, end_key + 1) - max(block_start, start_key)
+            return (n_aligned, [tgt_name]) if n_aligned > 0 else (0, [])
+
+        block_start = self.src_key[i_first:i_last + 1]
+        block_end = block_start + self.length[i_first:i_last + 1]
+        n_aligned = np.minimum(block_end, end_key + 1) - np.maximum(block_start, start_key)
+        aligned = n_aligned > 0
+        tgt_ids = self.tgt_contig[i_first:i_last + 1][aligned]
+        # Target contigs in source order, without duplicates
+        tgt_names = [self.tgt_names[t] for t in dict.fromkeys(tgt_ids.tolist())]
+        return int(n_aligned[aligned].sum()), tgt_names
+
+    def convert_coordinate(self, src_chrom: str, bed_pos: int) -> Optional[Tuple[str, int]]:
+        """
+        Lift one 0-based position.
+
+        Returns:
+            (target contig, 0-based target position) or None if the position is not lifted
+        """
+        key = self.source_key(src_chrom, bed_pos)
+        if key is None:
+            return None
+
+        # Last block starting at or before the position
+        i = self.find_block(key)
+        if i < 0:
+            return None
+        start_key, end_key, tgt_name, tgt_start, tgt_strand, tgt_size = self.block(i)
+        if key >= end_key:
+            # Position in a gap (or in the previous source contig)
+            return None
+        return tgt_name, block_position(key, start_key, tgt_start, tgt_strand, tgt_size)
+
+
+    def save(self, index_path: str):
+        """
+        Save the index in the "index_path" directory (written in a temporary directory, then renamed).
+        If "index_path" already exists (e.g. written by a concurrent run), it is kept as is.
+        """
+        parent_dir = os.path.dirname(os.path.abspath(index_path))
+        tmp_path = tempfile.mkdtemp(dir=parent_dir, suffix=".lsvidx.tmp")
+        try:
+            with open(os.path.join(tmp_path, "contigs.json"), "w") as f:
+                json.dump({"version": INDEX_FORMAT_VERSION, "src_names": self.src_names, "tgt_names": self.tgt_names}, f)
+            for name in INDEX_ARRAYS:
+                np.save(os.path.join(tmp_path, f"{name}.npy"), getattr(self, name))
+            os.rename(tmp_path, index_path)
+        except OSError:
+            if not os.path.isdir(index_path):
+                raise
+        finally:
+            if os.path.isdir(tmp_path):
+                shutil.rmtree(tmp_path, ignore_errors=True)
+
+
+    @classmethod
+    def load(cls, index_path: str) -> "ChainIndex":
+        """
+        Open an index saved with "save".
+        The arrays are memory-mapped (read-only): nothing is parsed, pages are loaded on demand.
+        """
+        with open(os.path.join(index_path, "contigs.json")) as f:
+            contigs = json.load(f)
+        if contigs.get("version") != INDEX_FORMAT_VERSION:
+            raise ValueError(f"Chain index '{index_path}' has an unsupported format version")
+        arrays = {name: np.load(os.path.join(index_path, f"{name}.npy"), mmap_mode="r") for name in INDEX_ARRAYS}
+        return cls(contigs["src_names"], arrays["src_sizes"], contigs["tgt_names"], arrays["tgt_sizes"],
+                   arrays["src_key"], arrays["length"], arrays["tgt_start"], arrays["tgt_contig"], arrays["tgt_strand"])
+
+
+    def share(self) -> Tuple[shared_memory.SharedMemory, Dict[str, Any]]:
+        """
+        Copy all the arrays of the index into a single shared memory block
+        (to be attached by the worker processes with "attach", whatever the start method: fork or spawn).
+
+        Returns:
+            (shared memory block, picklable handle to give to "attach")
+            The caller is responsible for calling close() and unlink() on the shared memory block.
+        """
+        layout = []
+        size = 0
+        for name in INDEX_ARRAYS:
+            array = getattr(self, name)
+            # Keep each array 8-bytes aligned
+            size = (size + 7) & ~7
+            layout.append((name, array.dtype.str, array.shape, size))
+            size += array.nbytes
+
+        shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        for name, dtype, shape, offset in layout:
+            np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)[...] = getattr(self, name)
+
+        handle = {"shm_name": shm.name, "layout": layout, "src_names": self.src_names, "tgt_names": self.tgt_names}
+        return shm, handle
+
+
+    @classmethod
+    def attach(cls, handle: Dict[str, Any]) -> "ChainIndex":
+        """
+        Open an index published in shared memory with "share" (no copy of the arrays).
+        """
+        try:
+            # Python >= 3.13: the creator process is the only one to track (and unlink) the block
+            shm = shared_memory.SharedMemory(name=handle["shm_name"], track=False)
+        except TypeError:
+            shm = shared_memory.SharedMemory(name=handle["shm_name"])
+
+        arrays = {}
+        for name, dtype, shape, offset in handle["layout"]:
+            array = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)
+            array.flags.writeable = False
+            arrays[name] = array
+
+        index = cls(handle["src_names"], arrays["src_sizes"], handle["tgt_names"], arrays["tgt_sizes"],
+                    arrays["src_key"], arrays["length"], arrays["tgt_start"], arrays["tgt_contig"], arrays["tgt_strand"])
+        # Keep the shared memory block open as long as the index is used
+        index._shm = shm
+        return index
+
+
+    def source_contig_ids(self, src_chroms) -> np.ndarray:
+        """
+        Convert source contig names into source contig ids (UNMAPPED for a contig absent from the chain file).
+        """
+        src_ids = self.src_ids
+        return np.fromiter((src_ids.get(c, UNMAPPED) for c in src_chroms), dtype=np.int64, count=len(src_chroms))
+
+
+    def convert_coordinates(self, src_ids, bed_pos) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Lift arrays of 0-based positions (vectorized version of "convert_coordinate").
+
+        Args:
+            src_ids: source contig ids (see "source_contig_ids")
+            bed_pos: 0-based positions (same length as src_ids)
+
+        Returns:
+            (target contig ids, 0-based target positions)
+            Both values are set to UNMAPPED for the positions that are not lifted.
+        """
+        src_ids = np.asarray(src_ids, dtype=np.int64)
+        bed_pos = np.asarray(bed_pos, dtype=np.int64)
+        new_ids = np.full(src_ids.shape, UNMAPPED, dtype=np.int64)
+        new_pos = np.full(src_ids.shape, UNMAPPED, dtype=np.int64)
+        if len(self.src_key) == 0:
+            return new_ids, new_pos
+
+        valid = (src_ids >= 0) & (src_ids < len(self.src_names)) & (bed_pos >= 0) & (bed_pos <= MAX_POSITION)
+        keys = (np.where(valid, src_ids, 0) << CONTIG_SHIFT) | np.where(valid, bed_pos, 0)
+
+        # Last block starting at or before each position
+        i = np.searchsorted(self.src_key, keys, side="right") - 1
+        valid &= i >= 0
+        i[~valid] = 0
+        offset = keys - self.src_key[i]
+        # Position in a gap (or in the previous source contig)
+        valid &= offset < self.length[i]
+
+        tgt_ids = self.tgt_contig[i].astype(np.int64)
+        pos = self.tgt_start[i] + offset
+        # "-" strand: the target start is given on the reverse-complemented contig
+        minus = self.tgt_strand[i] < 0
+        pos[minus] = self.tgt_sizes[tgt_ids[minus]] - 1 - pos[minus]
+
+        new_ids[valid] = tgt_ids[valid]
+        new_pos[valid] = pos[valid]
+        return new_ids, new_pos
+
+
+    def target_sizes(self) -> Dict[str, int]:
+        """Return the size of each contig of the target build."""
+        return {name: int(size) for name, size in zip(self.tgt_names, self.tgt_sizes)}
+
+
+    @property
+    def nbytes(self) -> int:
+        """Memory used by the blocks arrays."""
+        return sum(a.nbytes for a in (self.src_key, self.length, self.tgt_start, self.tgt_contig, self.tgt_strand))
+
+
+
+def block_position(key: int, start_key: int, tgt_start: int, tgt_strand: int, tgt_size: int) -> int:
+    """
+    Return the 0-based target position of the source "key" inside the block
+    (start_key, tgt_start, tgt_strand, tgt_size), see ChainIndex.block.
+    """
+    new_bed_pos = tgt_start + key - start_key
+    if tgt_strand < 0:
+        # "-" strand: the target start is given on the reverse-complemented contig
+        new_bed_pos = tgt_size - 1 - new_bed_pos
+    return new_bed_pos
+
+
+def chain_checksum(chain_file: str) -> str:
+    """Return the SHA-256 checksum of the chain file (as stored on disk, compressed or not)."""
+    sha = hashlib.sha256()
+    with open(chain_file, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def chain_index_path(chain_files: Sequence[str], index_dir: str) -> str:
+    """
+    Path of the binary index of one chain file or of a list of composed chain files
+    (keyed by the checksums of the chain files).
+    """
+    chain_name = "+".join(os.path.basename(chain_file) for chain_file in chain_files)
+    checksum = chain_checksum(chain_files[0])
+    if len(chain_files) > 1:
+        # The order of the chain files matters
+        checksum = hashlib.sha256(":".join(chain_checksum(chain_file) for chain_file in chain_files).encode()).hexdigest()
+    return os.path.join(index_dir, f"{chain_name}.{checksum[:16]}.v{INDEX_FORMAT_VERSION}.lsvidx")
+
+
+def load_or_build_chain_index(chain_files: Sequence[str], index_dir: str) -> Tuple[ChainIndex, str, bool]:
+    """
+    Open the cached binary index of the chain files, or build and cache it if it doesn't exist yet.
+    Several chain files are composed in the given order (see ChainIndex.compose).
+
+    Returns:
+        (index, index path, True if the index has been built)
+        The index path is None if the index could not be saved (e.g. read-only index directory):
+        the index is then only kept in memory.
+    """
+    index_path = chain_index_path(chain_files, index_dir)
+    if os.path.isdir(index_path):
+        return ChainIndex.load(index_path), index_path, False
+
+    index = ChainIndex.from_chain_files(chain_files)
+    try:
+        index.save(index_path)
+    except OSError:
+        return index, None, True
+    return ChainIndex.load(index_path), index_path, True
+
+
+def _resolve_overlaps(src_key, length, tgt_start, tgt_contig, tgt_strand, score, order):
+    """
+    Split overlapping blocks so that each source position is covered by only 1 block:
+    the block of the chain with the highest score (then the first chain in the file).
+
+    Blocks are sorted by src_key. Only the clusters of overlapping blocks are
+    processed in Python (they are rare in the UCSC chain files).
+    """
+    if len(src_key) < 2:
+        return src_key, length, tgt_start, tgt_contig, tgt_strand
+
+    end_key = src_key + length
+    # A block overlaps the previous ones if it starts before the maximum end seen so far
+    max_end_before = np.maximum.accumulate(end_key)[:-1]
+    overlapping = src_key[1:] < max_end_before
+    if not overlapping.any():
+        return src_key, length, tgt_start, tgt_contig, tgt_strand
+
+    # Clusters of transitively overlapping blocks
+    cluster_id = np.concatenate(([0], np.cumsum(~overlapping)))
+    cluster_bounds = np.flatnonzero(np.diff(cluster_id)) + 1
+    starts = np.concatenate(([0], cluster_bounds))
+    ends = np.concatenate((cluster_bounds, [len(src_key)]))
+
+    keep = np.ones(len(src_key), dtype=bool)
+    new_blocks = []
+    for first, last in zip(starts, ends):
+        if last - first < 2:
+            continue
+        keep[first:last] = False
+        new_blocks.extend(_sweep_cluster(src_key, length, tgt_start, tgt_contig, tgt_strand, score, order, first, last))
+
+    new_blocks = np.array(new_blocks, dtype=np.int64).reshape(-1, 5)
+    src_key = np.concatenate((src_key[keep], new_blocks[:, 0]))
+    length = np.concatenate((length[keep], new_blocks[:, 1]))
+    tgt_start = np.concatenate((tgt_start[keep], new_blocks[:, 2]))
+    tgt_contig = np.concatenate((tgt_contig[keep], new_blocks[:, 3].astype(np.int32)))
+    tgt_strand = np.concatenate((tgt_strand[keep], new_blocks[:, 4].astype(np.int8)))
+
+    sort_idx = np.argsort(src_key, kind="stable")
+    return (src_key[sort_idx], length[sort_idx], tgt_start[sort_idx],
+            tgt_contig[sort_idx], tgt_strand[sort_idx])
+
+
+def _sweep_cluster(src_key, length, tgt_start, tgt_contig, tgt_strand, score, order, first, last):
+    """
+    Sweep-line over one cluster of overlapping blocks.
+    Returns the list of the non-overlapping (src_key, length, tgt_start, tgt_contig, tgt_strand) pieces.
+    """
+    # Every block boundary is a possible change of the best block
+    bounds = sorted({int(k) for i in range(first, last) for k in (src_key[i], src_key[i] + length[i])})
+    pieces = []
+    active = []  # heap of (-score, order, block index)
+    i = first
+    for left, right in zip(bounds[:-1], bounds[1:]):
+        while i < last and src_key[i] <= left:
+            heapq.heappush(active, (-score[i], order[i], i))
+            i += 1
+        # Lazy removal of the blocks ending before "left"
+        while active and src_key[active[0][2]] + length[active[0][2]] <= left:
+            heapq.heappop(active)
+        if not active:
+            continue
+        best = active[0][2]
+        offset = left - int(src_key[best])
+        piece = [left, right - left, int(tgt_start[best]) + offset, int(tgt_contig[best]), int(tgt_strand[best])]
+        # Merge with the previous piece if it comes from the same block
+        if pieces and pieces[-1][5] == best and pieces[-1][0] + pieces[-1][1] == left:
+            pieces[-1][1] += right - left
+        else:
+            pieces.append(piece + [best])
+    return [p[:5] for p in pieces]
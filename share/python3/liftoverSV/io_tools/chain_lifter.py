@@ -19,8 +19,25 @@ You should have received a copy of the GNU General Public License
 along with this program; If not, see <http://www.gnu.org/licenses/>.
 """
 
-from typing import List, Tuple, Optional
-from pyliftover import LiftOver
+import weakref
+import numpy as np
+from functools import lru_cache
+from typing import Any, Dict, List, NamedTuple, Sequence, Tuple, Optional, Union
+from io_tools.chain_index import ChainIndex, UNMAPPED, block_position
+
+
+class LiftedInterval(NamedTuple):
+    """
+    Result of ChainLifter.lift_interval (1-based coordinates, None if not lifted)
+    """
+    start_chrom: Optional[str]
+    start: Optional[int]
+    end_chrom: Optional[str]
+    end: Optional[int]
+    # Target contigs of the aligned blocks between start and end (in source order)
+    target_chroms: List[str]
+    # Fraction of the [start, end] positions covered by aligned blocks (UCSC liftOver "-minMatch")
+    aligned_fraction: float
 
 
 class ChainLifter:
@@ -31,6 +48,14 @@ class ChainLifter:
     This version ignores the strand information and only returns the
     new vcf_chromosome and 1-based position for each input coordinate.
 
+    The aligned blocks of the chain file are stored in NumPy arrays (see ChainIndex)
+    and each lookup is done with a binary search (searchsorted).
+    For coordinate-sorted input, "lift" remembers the last block found for each contig
+    (one cursor per coordinate type: POS, END, ALT...) and searches forward from it (sweep-line).
+    It falls back automatically to the full binary search when the input is not sorted.
+    Same results as pyliftover (if several chains overlap a position, the chain with
+    the highest score is used), with a much smaller memory footprint.
+
     Conversion:
         Input coordinates must be 1-based (VCF convention).
         Output coordinates are also 1-based.
@@ -38,45 +63,202 @@ class ChainLifter:
     Example:
         chain = ChainLifter("hg19ToHg38.over.chain.gz")
         new_chrom, new_pos = chain.lift("chr1", 12345)
-        results = chain.lift_many([("chr1", 12345), ("chr2", 67890)])
+        new_chrom_end, new_end = chain.lift("chr1", 13345, cursor="END")
+
+        # Interval: both endpoints + fraction of the interval covered by aligned blocks
+        interval = chain.lift_interval("chr1", 12345, 13345)
+
+        # Batch: contig ids and positions as arrays (UNMAPPED = -1 if not lifted)
+        contig_ids = chain.contig_ids(["chr1", "chr2"])
+        new_contig_ids, new_pos = chain.lift_many(contig_ids, np.array([12345, 67890]))
+        new_chroms = chain.target_contig_names(new_contig_ids)
     """
-    def __init__(self, chain_file):
-        """Load the .chain file once (using pyliftover) and returns the LiftOver object."""
-        self.lo = LiftOver(chain_file)
+    def __init__(self, chain_file: Union[str, Sequence[str]], index_path: Optional[str] = None, shared_index: Optional[Dict[str, Any]] = None,
+                 cache_size: int = 0):
+        """
+        Load the chain index:
+        - from the shared memory handle "shared_index" if given (see ChainIndex.share / ChainIndex.attach)
+        - else from the binary index "index_path" if given (memory-mapped, see ChainIndex.load:
+          only the pages of the blocks of the lifted contigs are read)
+        - else by parsing the .chain file
+          (or a list of .chain files composed in the given order, e.g. hg18ToHg19 then hg19ToHg38)
+
+        cache_size: maximum number of (vcf_chrom, vcf_pos) -> (new_vcf_chrom, new_vcf_pos) results
+                    memorized by "lift" (bounded LRU cache, 0 = no cache)
+        """
+        if shared_index:
+            self.index = ChainIndex.attach(shared_index)
+        elif index_path:
+            self.index = ChainIndex.load(index_path)
+        else:
+            self.index = ChainIndex.from_chain_files([chain_file] if isinstance(chain_file, str) else chain_file)
+
+        # Sweep-line cursors: (vcf_chrom, cursor) -> (block index, ChainIndex.block(block index))
+        self.cursors = {}
+        self.cursor_hits = 0
+        self.cursor_fallbacks = 0
+
+        # Cursor of the current "lift" call (set outside the cached lookup, see "lift")
+        self._cursor = "POS"
 
-    def lift(self, vcf_chrom: str, vcf_pos: int) -> Tuple[Optional[str], Optional[int]]:
+        # Many lookups are repeated (POS = last NT of a 1-base REF, BND mates, same breakpoints
+        # in merged VCF...) => memorize the last "cache_size" results
+        # - One LRU cache per ChainLifter, keyed by (vcf_chrom, vcf_pos) only: the same position
+        #   looked up with different cursors (POS, END...) is a hit
+        # - The cache only holds a weak reference to the lifter (no reference cycle)
+        self._cached_lift = None
+        if cache_size > 0:
+            lift_uncached = weakref.WeakMethod(self._lift_uncached)
+            self._cached_lift = lru_cache(maxsize=cache_size)(lambda vcf_chrom, vcf_pos: lift_uncached()(vcf_chrom, vcf_pos))
+
+    def cache_info(self):
+        """
+        Return the statistics of the LRU cache (hits, misses, maxsize, currsize), or None if there is no cache.
+        """
+        if self._cached_lift is not None:
+            return self._cached_lift.cache_info()
+        return None
+
+    def lift(self, vcf_chrom: str, vcf_pos: int, cursor: str = "POS") -> Tuple[Optional[str], Optional[int]]:
         """
         Lift a single genomic coordinate (vcf_chromosome, vcf_position).
         
         Args:
             vcf_chrom (str): Chromosome name in the source genome
             vcf_pos (int): 1-based coordinate in the source genome
+            cursor (str): Name of the sweep-line cursor to use. Successive coordinates of a same
+                          cursor are expected to be sorted (e.g. "POS" for the POS of a sorted VCF,
+                          "END" for the END...). Unsorted coordinates are still correctly lifted (slower).
 
         Returns:
             Tuple[str|None, int|None]: New chromosome and position
                                         or (None, None) if lift fails
         """
+        # The cursor only speeds up the search of the block (same result whatever the cursor)
+        self._cursor = cursor
+        if self._cached_lift is not None:
+            return self._cached_lift(vcf_chrom, vcf_pos)
+        return self._lift_uncached(vcf_chrom, vcf_pos)
+
+    def _lift_uncached(self, vcf_chrom: str, vcf_pos: int) -> Tuple[Optional[str], Optional[int]]:
+        """
+        Lift a single genomic coordinate with the sweep-line cursor "self._cursor" (see "lift").
+        """
         # Convert 1-based VCF coordinate to 0-based for LiftOver
         bed_pos=vcf_pos-1
 
-        # "convert_coordinate" method: 
-        # - Input coordinates must be 0-based
-        # - output coordinates are also 0-based.
-        lifted = self.lo.convert_coordinate(vcf_chrom, bed_pos)
-        if lifted:
-            new_vcf_chrom, new_bed_pos, strand, _chain = lifted[0]
-            # Convert back to 1-based
-            new_vcf_pos=new_bed_pos+1
-            return new_vcf_chrom, new_vcf_pos
+        key = self.index.source_key(vcf_chrom, bed_pos)
+        if key is None:
+            return None, None
+
+        cursor = self._cursor
+        state = self.cursors.get((vcf_chrom, cursor))
+        if state is not None and state[1][0] <= key < state[1][1]:
+            # Same block as the previous coordinate
+            self.cursor_hits += 1
+            i, block = state
         else:
+            if state is None or key < state[1][0]:
+                # First coordinate of the contig, or unsorted input: full binary search
+                self.cursor_fallbacks += 1
+                i = self.index.find_block(key)
+            else:
+                # Sorted input: finger search forward from the previous block
+                self.cursor_hits += 1
+                i = self.index.find_block(key, state[0])
+            if i < 0:
+                return None, None
+            block = self.index.block(i)
+            self.cursors[(vcf_chrom, cursor)] = (i, block)
+
+        start_key, end_key, new_vcf_chrom, tgt_start, tgt_strand, tgt_size = block
+        if key >= end_key:
+            # Position in a gap (or in the previous source contig)
             return None, None
 
-    def lift_many(self, positions: List[Tuple[str, int]]) -> List[Tuple[Optional[str], Optional[int]]]:
+        new_bed_pos = block_position(key, start_key, tgt_start, tgt_strand, tgt_size)
+        # Convert back to 1-based
+        new_vcf_pos=new_bed_pos+1
+        return new_vcf_chrom, new_vcf_pos
+
+    def lift_interval(self, vcf_chrom: str, vcf_start: int, vcf_end: int) -> LiftedInterval:
         """
-        Lift multiple genomic coordinates in batch.
+        Lift an interval (e.g. POS-END of a DEL/DUP/INV) with one walk through the chain blocks.
+
         Args:
-            positions (list[tuple[str, int]]): List of (vcf_chrom, pos) tuples.
+            vcf_chrom (str): Chromosome name in the source genome
+            vcf_start (int): 1-based start coordinate in the source genome (lifted with the "POS" cursor)
+            vcf_end (int): 1-based end coordinate in the source genome (lifted with the "END" cursor)
+
         Returns:
-            list[tuple[str|None, int|None]]:
+            LiftedInterval: both lifted endpoints, the target contigs between them
+                            and the fraction of the interval covered by aligned blocks
+        """
+        start_chrom, start = self.lift(vcf_chrom, vcf_start)
+        end_chrom, end = self.lift(vcf_chrom, vcf_end, cursor="END")
+        aligned_fraction, target_chroms = self.aligned_coverage(vcf_chrom, vcf_start, vcf_end)
+        return LiftedInterval(start_chrom, start, end_chrom, end, target_chroms, aligned_fraction)
+
+    def aligned_coverage(self, vcf_chrom: str, vcf_start: int, vcf_end: int) -> Tuple[float, List[str]]:
+        """
+        Walk the chain blocks between two 1-based coordinates (without lifting them).
+
+        Returns:
+            Tuple[float, List[str]]: fraction of the interval covered by aligned blocks
+                                     and target contigs of these blocks (in source order)
+        """
+        # Interval of the source contig (0-based keys)
+        start_key = self.index.source_key(vcf_chrom, min(vcf_start, vcf_end) - 1)
+        end_key = self.index.source_key(vcf_chrom, max(vcf_start, vcf_end) - 1)
+        if start_key is None or end_key is None:
+            return 0.0, []
+
+        # Start the walk from the block of the "POS" cursor (sorted input)
+        state = self.cursors.get((vcf_chrom, "POS"))
+        n_aligned, target_chroms = self.index.aligned_coverage(start_key, end_key, state[0] if state else -1)
+        return n_aligned / (end_key - start_key + 1), target_chroms
+
+    def contig_ids(self, vcf_chroms: Sequence[str]) -> np.ndarray:
+        """
+        Convert vcf_chromosome names (source genome) into contig ids for "lift_many".
+        Contigs absent from the chain file get the UNMAPPED id.
+        """
+        return self.index.source_contig_ids(vcf_chroms)
+
+    def target_contig_names(self, new_contig_ids: np.ndarray) -> List[Optional[str]]:
+        """
+        Convert target contig ids returned by "lift_many" into chromosome names (None for UNMAPPED).
         """
-        return [self.lift(vcf_chrom, vcf_pos) for vcf_chrom, vcf_pos in positions]
+        names = self.index.tgt_names
+        return [names[i] if i != UNMAPPED else None for i in new_contig_ids.tolist()]
+
+    def target_contig_sizes(self, new_contig_ids: np.ndarray) -> np.ndarray:
+        """
+        Return the size of the target contigs returned by "lift_many" (0 for UNMAPPED).
+        """
+        new_contig_ids = np.asarray(new_contig_ids, dtype=np.int64)
+        lifted = new_contig_ids != UNMAPPED
+        sizes = np.zeros(new_contig_ids.shape, dtype=np.int64)
+        sizes[lifted] = self.index.tgt_sizes[new_contig_ids[lifted]]
+        return sizes
+
+    def lift_many(self, contig_ids: np.ndarray, vcf_positions: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Lift multiple genomic coordinates in batch (vectorized, no Python loop over the coordinates).
+
+        Args:
+            contig_ids (np.ndarray): Source contig ids (see "contig_ids")
+            vcf_positions (np.ndarray): 1-based coordinates in the source genome (same length)
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Target contig ids and 1-based positions
+                                           (UNMAPPED for both values if the lift fails)
+        """
+        # Convert 1-based VCF coordinates to 0-based
+        bed_positions = np.asarray(vcf_positions, dtype=np.int64) - 1
+
+        new_contig_ids, new_bed_positions = self.index.convert_coordinates(contig_ids, bed_positions)
+
+        # Convert back to 1-based (only for the lifted positions)
+        new_vcf_positions = np.where(new_contig_ids != UNMAPPED, new_bed_positions + 1, UNMAPPED)
+        return new_contig_ids, new_vcf_positions
@@ -19,44 +19,92 @@ along with this program; If not, see <http://www.gnu.org/licenses/>.
 """
 
 import os
-from typing import List, Tuple
-from pyfaidx import Fasta
+from bisect import bisect_right
+from typing import Dict, List, Tuple
+from pyfaidx import Faidx
+from core.constants import FETCH_MERGE_DISTANCE, FETCH_MAX_WINDOW_SIZE, FASTA_CACHE_BLOCK_SIZE
+from io_tools.fasta_readers import MmapFastaReader, BgzfFastaReader, TwoBitReader, BlockCacheReader
 
 
 class FastaExtractor:
     """
-    Efficiently extract sequences from a reference FASTA file using pyfaidx.
+    Efficiently extract sequences from a reference FASTA file (uncompressed or bgzipped)
+    or UCSC .2bit file.
     Automatically uses the .fai index if it exists, otherwise creates it
-    and informs the user.
+    (with pyfaidx) and informs the user.
+
+    The FASTA file is memory-mapped and the .fai index gives the byte offset
+    of each position (see MmapFastaReader): no file I/O per call.
     
     Usage:
         extractor = FastaExtractor("/path/to/ref.fasta")
         seq = extractor.get_sequence("chr1", 1000, 1010)
+
+        # Batch: fetches sorted by (contig, start), nearby windows read once
+        seqs = extractor.get_sequences([("chr2", 500, 510), ("chr1", 1000, 1010)])
+
+        # Read the windows of the next get_sequence calls in coordinate order
+        extractor.prefetch([("chr2", 500, 510), ("chr1", 1000, 1010)])
     """
 
-    def __init__(self, fasta_path: str):
+    def __init__(self, fasta_path: str, merge_distance: int = FETCH_MERGE_DISTANCE, cache_size: int = 0,
+                 max_window_size: int = FETCH_MAX_WINDOW_SIZE):
         """
-        Initialize the extractor and use pyfaidx for indexed access.
+        Initialize the extractor and memory-map the FASTA file for indexed access.
 
         Args:
-            fasta_path (str): Path to the reference FASTA file
+            fasta_path (str): Path to the reference FASTA file (.fa, .fasta, .fa.gz, .fasta.gz) or .2bit file
+            merge_distance (int): fetches closer than this distance are read in one window
+                                  (get_sequences, prefetch)
+            max_window_size (int): maximum length of a merged window (memory bound of prefetch)
+            cache_size (int): memory cap (bytes) of the LRU cache of reference blocks
+                              (see BlockCacheReader), 0 = no cache
         """
         self.fasta_path = fasta_path
-        fai_path = fasta_path + ".fai"
-        index_was_missing = not os.path.exists(fai_path)
-
-        # Check if .fai exists
-        if index_was_missing:
-            print(fai_path)
-            print(f"[INFO] Index file '{fai_path}' does not exist. Creating it...")
+        self.merge_distance = merge_distance
+        self.max_window_size = max_window_size
+        # Windows read by "prefetch": {chrom: ([window starts], [window ends], [window sequences])}
+        self.prefetched: Dict[str, Tuple[List[int], List[int], List[str]]] = {}
+
+        if fasta_path.lower().endswith(".2bit"):
+            # UCSC .2bit file: random access without .fai index
+            self.extractor = TwoBitReader(fasta_path)
+        elif fasta_path.lower().endswith(".gz"):
+            # bgzip-compressed FASTA file: .fai and .gzi indexes created by "samtools faidx"
+            self.extractor = BgzfFastaReader(fasta_path, fasta_path + ".fai", fasta_path + ".gzi")
+        else:
+            fai_path = fasta_path + ".fai"
+            index_was_missing = not os.path.exists(fai_path)
+
+            # Check if .fai exists
+            if index_was_missing:
+                print(fai_path)
+                print(f"[INFO] Index file '{fai_path}' does not exist. Creating it...")
+
+            # pyfaidx creates the index if needed (and checks the FASTA format)
+            if index_was_missing:
+                Faidx(fasta_path).close()
+
+            # Memory-map the FASTA file
+            self.extractor = MmapFastaReader(fasta_path, fai_path)
+
+            # Confirm index is ready
+            if index_was_missing and os.path.exists(fai_path):
+                print(f"[INFO] Index '{fai_path}' has been created.")
+
+        # Keep the recently read blocks of the reference in memory
+        if cache_size > 0:
+            self.extractor = BlockCacheReader(self.extractor, cache_size, FASTA_CACHE_BLOCK_SIZE)
+            
 
-        # Load FASTA with pyfaidx; creates index if needed
-        self.extractor = Fasta(fasta_path)
+    def cache_info(self):
+        """
+        Return the statistics of the block cache (hits, misses, blocks, bytes), or None if there is no cache.
+        """
+        if isinstance(self.extractor, BlockCacheReader):
+            return self.extractor.cache_info()
+        return None
 
-        # Confirm index is ready
-        if index_was_missing and os.path.exists(fai_path):
-            print(f"[INFO] Index '{fai_path}' has been created.")
-            
 
     def get_sequence(self, vcf_chrom: str, vcf_start: int, vcf_end: int) -> str:
         """
@@ -74,11 +122,19 @@ class FastaExtractor:
             ValueError: if chromosome not found in FASTA
 
         """
-        # Convert to 0-based indexing for pyfaidx
+        # Window already read by "prefetch"?
+        windows = self.prefetched.get(vcf_chrom)
+        if windows and vcf_start <= vcf_end:
+            i = bisect_right(windows[0], vcf_start) - 1
+            if i >= 0 and vcf_end <= windows[1][i]:
+                window_start = windows[0][i]
+                return windows[2][i][vcf_start - window_start:vcf_end - window_start + 1]
+
+        # Convert to 0-based indexing
         bed_start = vcf_start - 1
 
         try:
-            return self.extractor[vcf_chrom][bed_start:vcf_end].seq
+            return self.extractor.fetch(vcf_chrom, bed_start, vcf_end)
         except KeyError:
             raise ValueError(f"Chromosome '{vcf_chrom}' not found in FASTA.")
 
@@ -97,7 +153,75 @@ class FastaExtractor:
         for chrom, start, end in bed_lines:
             sequences.append(self.get_sequence(chrom, start, end))
         return sequences
-    
-    
-    
-    
\ No newline at end of file
+
+
+    def _merge_windows(self, fetches: List[Tuple[str, int, int]]) -> Tuple[List[Tuple[str, int, int, List[int]]], List[int]]:
+        """
+        Sort the fetches (chrom, 1-based start, 1-based end) by (contig, start) and merge
+        the overlapping or nearby ones (closer than self.merge_distance), as long as the merged
+        window is not longer than self.max_window_size.
+
+        Returns:
+            1) merged windows: list of (chrom, start, end, [indices of the fetches inside the window])
+            2) indices of the fetches that can't be merged (empty or out of the contig)
+        """
+        lengths = self.extractor.lengths
+        windows, others = [], []
+        order = sorted(range(len(fetches)), key=lambda i: (fetches[i][0], fetches[i][1]))
+        for i in order:
+            chrom, start, end = fetches[i]
+            if chrom not in lengths or start < 1 or end < start or end > lengths[chrom]:
+                others.append(i)
+            elif (windows and windows[-1][0] == chrom and start <= windows[-1][2] + self.merge_distance
+                  and max(windows[-1][2], end) - windows[-1][1] < self.max_window_size):
+                window = windows[-1]
+                window[2] = max(window[2], end)
+                window[3].append(i)
+            else:
+                windows.append([chrom, start, end, [i]])
+        return [tuple(window) for window in windows], others
+
+
+    def get_sequences(self, fetches: List[Tuple[str, int, int]]) -> List[str]:
+        """
+        Extract multiple sequences (e.g. all the REF/ALT of a chunk) in coordinate order.
+
+        The fetches are sorted by (contig, start), the overlapping or nearby windows are merged
+        and each merged window is read once (sequential instead of random I/O).
+
+        Args:
+            fetches (list of tuples): Each tuple is (chrom, 1-based start, 1-based end)
+
+        Returns:
+            list of str: Extracted DNA sequences, in the order of "fetches"
+                         (same values as get_sequence for each fetch)
+        """
+        sequences = [None] * len(fetches)
+        windows, others = self._merge_windows(fetches)
+        for chrom, window_start, window_end, indices in windows:
+            window_seq = self.extractor.fetch(chrom, window_start - 1, window_end)
+            for i in indices:
+                _, start, end = fetches[i]
+                sequences[i] = window_seq[start - window_start:end - window_start + 1]
+        for i in others:
+            sequences[i] = self.get_sequence(*fetches[i])
+        return sequences
+
+
+    def prefetch(self, fetches: List[Tuple[str, int, int]]):
+        """
+        Read in coordinate order the merged windows of a batch of fetches (see get_sequences),
+        e.g. the lifted REF of all the variants of a chunk.
+        The next get_sequence calls inside these windows are served from memory
+        (until the next call to prefetch).
+
+        Args:
+            fetches (list of tuples): Each tuple is (chrom, 1-based start, 1-based end)
+        """
+        self.prefetched = {}
+        windows, _ = self._merge_windows(fetches)
+        for chrom, window_start, window_end, _ in windows:
+            starts, ends, seqs = self.prefetched.setdefault(chrom, ([], [], []))
+            starts.append(window_start)
+            ends.append(window_end)
+            seqs.append(self.extractor.fetch(chrom, window_start - 1, window_end))
@@ -0,0 +1,395 @@
+
+"""
+liftoverSV 0.3.1_beta
+=====================
+
+Copyright (C) 2024-current Veronique Geoffroy (veronique.geoffroy@inserm.fr)
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 3
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import mmap
+import zlib
+import struct
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Tuple
+
+
+# Random-access readers of a reference genome, used by FastaExtractor:
+# - MmapFastaReader: uncompressed FASTA (.fa, .fasta) with its .fai index
+# - BgzfFastaReader: bgzip-compressed FASTA (.fa.gz, .fasta.gz) with its .fai and .gzi indexes
+# - TwoBitReader: UCSC .2bit
+# - BlockCacheReader: LRU cache of sequence blocks in front of another reader
+#
+# Each reader provides:
+# - lengths: dict {contig name: contig length}
+# - fetch(chrom, bed_start, bed_end): sequence of the 0-based half-open interval [bed_start, bed_end)
+#       * same behaviour as a Python slice of the contig sequence (clamped to the contig, "" if empty)
+#       * case of the reference preserved (soft-masked bases in lowercase)
+#       * KeyError if the contig is not in the reference
+
+
+class FaiRecord(NamedTuple):
+    """
+    One line of a .fai index (samtools faidx format):
+    NAME  LENGTH  OFFSET  LINEBASES  LINEWIDTH
+    """
+    length: int
+    # Byte offset of the first base of the contig
+    offset: int
+    # Number of bases per line
+    line_bases: int
+    # Number of bytes per line (bases + "\n" or "\r\n")
+    line_width: int
+
+
+def read_fai(fai_path: str) -> Dict[str, FaiRecord]:
+    """
+    Read a .fai index: {contig name: FaiRecord}
+    """
+    records = {}
+    with open(fai_path) as f:
+        for line in f:
+            fields = line.rstrip("\n").split("\t")
+            if len(fields) < 5:
+                continue
+            records[fields[0]] = FaiRecord(*map(int, fields[1:5]))
+    return records
+
+
+class MmapFastaReader:
+    """
+    Uncompressed FASTA file memory-mapped once, with its .fai index.
+
+    1-based/0-based coordinates are converted into byte offsets with the line length
+    of each contig: a fetch is a slice of the mapping (no seek/read system call,
+    the pages are shared through the page cache by all the workers).
+    """
+
+    def __init__(self, fasta_path: str, fai_path: str):
+        self.fasta_path = fasta_path
+        self.records = read_fai(fai_path)
+        self.lengths = {name: record.length for name, record in self.records.items()}
+
+        with open(fasta_path, "rb") as f:
+            # mmap() can't map an empty file
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.records else b""
+
+    def fetch(self, chrom: str, bed_start: int, bed_end: int) -> str:
+        """
+        Return the sequence of [bed_start, bed_end) (0-based, half-open) of the contig "chrom".
+        """
+        record = self.records[chrom]
+        bed_start, bed_end, _ = slice(bed_start, bed_end).indices(record.length)
+        if bed_end <= bed_start:
+            return ""
+
+        line_bases = record.line_bases
+        # Byte offsets of the first base and of the byte after the last base
+        byte_start = record.offset + (bed_start // line_bases) * record.line_width + bed_start % line_bases
+        last = bed_end - 1
+        byte_end = record.offset + (last // line_bases) * record.line_width + last % line_bases + 1
+
+        raw = self._read(byte_start, byte_end)
+        if byte_end - byte_start != bed_end - bed_start:
+            # The interval spans several lines: remove the end of lines
+            raw = raw.replace(b"\n", b"").replace(b"\r", b"")
+        return raw.decode("ascii")
+
+    def _read(self, byte_start: int, byte_end: int) -> bytes:
+        """
+        Return the bytes [byte_start, byte_end) of the (uncompressed) FASTA file.
+        """
+        return self.data[byte_start:byte_end]
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+
+
+# BGZF (bgzip) format (https://samtools.github.io/hts-specs/SAMv1.pdf, section 4.1):
+####################################################################################
+# A series of gzip members ("blocks") of at most 64 kb of uncompressed data.
+# Each block has an extra subfield "BC" giving its total size - 1 (BSIZE).
+# .gzi index (bgzip -i, samtools faidx): number of entries, then for each block except
+# the first one: (compressed offset, uncompressed offset), all little-endian uint64.
+# The offsets of the .fai index of a bgzipped FASTA file are uncompressed offsets.
+BGZF_MAGIC = b"\x1f\x8b\x08\x04"
+
+
+def is_bgzf(path: str) -> bool:
+    """
+    Check if a file is BGZF-compressed (gzip header with the "BC" extra subfield).
+    """
+    with open(path, "rb") as f:
+        header = f.read(18)
+    return len(header) == 18 and header[:4] == BGZF_MAGIC and header[12:14] == b"BC"
+
+
+class BgzfFastaReader(MmapFastaReader):
+    """
+    bgzip-compressed FASTA file (.fa.gz) with its .fai and .gzi indexes.
+
+    The .gzi index gives the block containing any uncompressed offset: only the blocks
+    of the fetched interval are inflated, and the last inflated blocks are kept in
+    an LRU cache (max_blocks blocks of at most 64 kb).
+    """
+
+    def __init__(self, fasta_path: str, fai_path: str, gzi_path: str, max_blocks: int = 64):
+        super().__init__(fasta_path, fai_path)
+
+        # (compressed offset, uncompressed offset) of each block, the first block is not in the .gzi
+        with open(gzi_path, "rb") as f:
+            gzi = f.read()
+        n_entries = struct.unpack_from("<Q", gzi, 0)[0]
+        offsets = struct.unpack_from(f"<{2 * n_entries}Q", gzi, 8)
+        self.block_offsets = array("Q", [0]) + array("Q", offsets[0::2])
+        self.block_starts = array("Q", [0]) + array("Q", offsets[1::2])
+
+        # LRU cache: block number -> inflated block
+        self.max_blocks = max_blocks
+        self.blocks = OrderedDict()
+
+    def _inflate(self, block_number: int) -> bytes:
+        """
+        Return the uncompressed data of a block (inflate it if it's not in the cache).
+        """
+        block = self.blocks.get(block_number)
+        if block is not None:
+            self.blocks.move_to_end(block_number)
+            return block
+
+        offset = self.block_offsets[block_number]
+        # Extra subfields (XLEN bytes after the 12 bytes of the fixed header): look for BSIZE in "BC"
+        extra_length = struct.unpack_from("<H", self.data, offset + 10)[0]
+        position = offset + 12
+        while position < offset + 12 + extra_length:
+            subfield_length = struct.unpack_from("<H", self.data, position + 2)[0]
+            if self.data[position:position + 2] == b"BC":
+                block_size = struct.unpack_from("<H", self.data, position + 4)[0] + 1
+                break
+            position += 4 + subfield_length
+        else:
+            raise ValueError(f"Invalid BGZF block at offset {offset} in {self.fasta_path}")
+
+        # Raw deflate data between the header and the CRC32/ISIZE trailer
+        block = zlib.decompress(self.data[offset + 12 + extra_length:offset + block_size - 8], -15)
+        self.blocks[block_number] = block
+        if len(self.blocks) > self.max_blocks:
+            self.blocks.popitem(last=False)
+        return block
+
+    def _read(self, byte_start: int, byte_end: int) -> bytes:
+        """
+        Return the bytes [byte_start, byte_end) of the uncompressed FASTA file.
+        """
+        block_number = bisect_right(self.block_starts, byte_start) - 1
+        parts = []
+        position = byte_start
+        while position < byte_end and block_number < len(self.block_starts):
+            block_start = self.block_starts[block_number]
+            block = self._inflate(block_number)
+            parts.append(block[position - block_start:byte_end - block_start])
+            position = block_start + len(block)
+            block_number += 1
+        return b"".join(parts)
+
+
+# UCSC .2bit format (https://genome.ucsc.edu/FAQ/FAQformat.html#format7):
+##########################################################################
+# header:   signature (0x1A412743), version, sequenceCount, reserved
+# index:    nameSize (1 byte), name, offset (4 bytes, 8 bytes if version = 1)   (one per sequence)
+# sequence: dnaSize, nBlockCount, nBlockStarts, nBlockSizes,
+#           maskBlockCount, maskBlockStarts, maskBlockSizes, reserved,
+#           packedDna (4 bases per byte, 2 bits per base: T=0, C=1, A=2, G=3, first base in the high bits)
+# N blocks are runs of N, mask blocks are runs of lowercase (soft-masked) bases.
+TWOBIT_SIGNATURE = 0x1A412743
+
+# The 4 bases of each possible byte of packedDna
+TWOBIT_BYTE_BASES = ["".join("TCAG"[(byte >> shift) & 3] for shift in (6, 4, 2, 0)) for byte in range(256)]
+
+
+class TwoBitReader:
+    """
+    UCSC .2bit file memory-mapped once (no .fai index needed).
+
+    The N blocks and mask blocks of a contig are read the first time the contig is fetched.
+    The sequences are the same as the ones of the FASTA file converted with faToTwoBit
+    (N for the N blocks, lowercase for the soft-masked bases).
+    """
+
+    def __init__(self, twobit_path: str):
+        self.twobit_path = twobit_path
+        with open(twobit_path, "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        # Byte order of the file: given by the signature
+        if struct.unpack_from("<I", self.data, 0)[0] == TWOBIT_SIGNATURE:
+            self.byte_order = "<"
+        elif struct.unpack_from(">I", self.data, 0)[0] == TWOBIT_SIGNATURE:
+            self.byte_order = ">"
+        else:
+            raise ValueError(f"Invalid .2bit file (bad signature): {twobit_path}")
+        version, sequence_count = struct.unpack_from(f"{self.byte_order}II", self.data, 4)
+        offset_format = f"{self.byte_order}{'Q' if version == 1 else 'I'}"
+
+        # Index: offset of each sequence
+        self.offsets = {}
+        position = 16
+        for _ in range(sequence_count):
+            name_size = self.data[position]
+            name = self.data[position + 1:position + 1 + name_size].decode("ascii")
+            position += 1 + name_size
+            self.offsets[name] = struct.unpack_from(offset_format, self.data, position)[0]
+            position += struct.calcsize(offset_format)
+
+        self.lengths = {name: struct.unpack_from(f"{self.byte_order}I", self.data, offset)[0]
+                        for name, offset in self.offsets.items()}
+
+        # Contigs already fetched: {name: (offset of packedDna, N blocks, mask blocks)}
+        self.records = {}
+
+    def _read_blocks(self, position: int) -> Tuple[Tuple[array, array], int]:
+        """
+        Read a list of blocks (count, starts, sizes) at "position".
+
+        Returns:
+            ((block starts, block ends), position after the list)
+        """
+        count = struct.unpack_from(f"{self.byte_order}I", self.data, position)[0]
+        starts = array("L", struct.unpack_from(f"{self.byte_order}{count}I", self.data, position + 4))
+        sizes = struct.unpack_from(f"{self.byte_order}{count}I", self.data, position + 4 + 4 * count)
+        ends = array("L", map(int.__add__, starts, sizes))
+        return (starts, ends), position + 4 + 8 * count
+
+    def _record(self, chrom: str):
+        record = self.records.get(chrom)
+        if record is None:
+            # dnaSize
+            position = self.offsets[chrom] + 4
+            n_blocks, position = self._read_blocks(position)
+            mask_blocks, position = self._read_blocks(position)
+            # reserved
+            position += 4
+            record = self.records[chrom] = (position, n_blocks, mask_blocks)
+        return record
+
+    def fetch(self, chrom: str, bed_start: int, bed_end: int) -> str:
+        """
+        Return the sequence of [bed_start, bed_end) (0-based, half-open) of the contig "chrom".
+        """
+        dna_offset, n_blocks, mask_blocks = self._record(chrom)
+        bed_start, bed_end, _ = slice(bed_start, bed_end).indices(self.lengths[chrom])
+        if bed_end <= bed_start:
+            return ""
+
+        # Decode the bytes containing the interval
+        first_byte = bed_start // 4
+        last_byte = (bed_end - 1) // 4
+        packed = self.data[dna_offset + first_byte:dna_offset + last_byte + 1]
+        seq = "".join([TWOBIT_BYTE_BASES[byte] for byte in packed])
+        seq = seq[bed_start - 4 * first_byte:bed_end - 4 * first_byte]
+
+        seq = _apply_blocks(seq, bed_start, bed_end, n_blocks, lambda bases: "N" * len(bases))
+        return _apply_blocks(seq, bed_start, bed_end, mask_blocks, str.lower)
+
+    def close(self):
+        self.data.close()
+
+
+def _apply_blocks(seq: str, bed_start: int, bed_end: int, blocks: Tuple[array, array], transform) -> str:
+    """
+    Apply "transform" to the parts of seq ([bed_start, bed_end) of a contig) inside
+    the blocks (block starts, block ends) of this contig (sorted, not overlapping).
+    """
+    starts, ends = blocks
+    # First block ending after bed_start
+    i = bisect_right(ends, bed_start)
+    while i < len(starts) and starts[i] < bed_end:
+        a = max(starts[i], bed_start) - bed_start
+        b = min(ends[i], bed_end) - bed_start
+        seq = seq[:a] + transform(seq[a:b]) + seq[b:]
+        i += 1
+    return seq
+
+
+class BlockCacheReader:
+    """
+    LRU cache of fixed-size sequence blocks in front of another reader
+    (lifted SVs cluster in hotspots: the same reference blocks are read again and again).
+
+    Each block (block_size bases, aligned on the contig start) is read once from the
+    underlying reader and kept in memory until the total size of the blocks exceeds max_bytes
+    (the least recently used blocks are evicted first).
+    """
+
+    def __init__(self, reader, max_bytes: int, block_size: int = 65536):
+        self.reader = reader
+        self.lengths = reader.lengths
+        self.max_bytes = max_bytes
+        self.block_size = block_size
+        # (chrom, block number) -> block sequence, from the least to the most recently used
+        self.blocks = OrderedDict()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _block(self, chrom: str, block_number: int) -> str:
+        """
+        Return the block "block_number" of the contig "chrom" (read it if not in the cache).
+        """
+        key = (chrom, block_number)
+        block = self.blocks.get(key)
+        if block is not None:
+            self.hits += 1
+            self.blocks.move_to_end(key)
+            return block
+
+        self.misses += 1
+        block_start = block_number * self.block_size
+        block = self.reader.fetch(chrom, block_start, block_start + self.block_size)
+        self.blocks[key] = block
+        self.current_bytes += len(block)
+        # Evict the least recently used blocks (keep at least the new one)
+        while self.current_bytes > self.max_bytes and len(self.blocks) > 1:
+            _, evicted = self.blocks.popitem(last=False)
+            self.current_bytes -= len(evicted)
+        return block
+
+    def fetch(self, chrom: str, bed_start: int, bed_end: int) -> str:
+        """
+        Return the sequence of [bed_start, bed_end) (0-based, half-open) of the contig "chrom".
+        """
+        bed_start, bed_end, _ = slice(bed_start, bed_end).indices(self.lengths[chrom])
+        if bed_end <= bed_start:
+            return ""
+
+        first_block = bed_start // self.block_size
+        last_block = (bed_end - 1) // self.block_size
+        offset = first_block * self.block_size
+        if first_block == last_block:
+            return self._block(chrom, first_block)[bed_start - offset:bed_end - offset]
+        seq = "".join(self._block(chrom, b) for b in range(first_block, last_block + 1))
+        return seq[bed_start - offset:bed_end - offset]
+
+    def cache_info(self) -> Dict[str, int]:
+        """
+        Statistics of the cache: hits, misses, number of blocks and size (bases) in memory.
+        """
+        return {"hits": self.hits, "misses": self.misses, "blocks": len(self.blocks), "bytes": self.current_bytes}
+
+    def close(self):
+        self.reader.close()
@@ -148,6 +148,9 @@ def file_with_chr(file_to_check):
     elif file_to_check.endswith(".vcf"):
         f = open(file_to_check, "r")
         file_type = "vcf"
+    elif file_to_check.endswith(".chain.gz"):
+        f = gzip.open(file_to_check, "rt")
+        file_type = "chain"
     elif file_to_check.endswith(".chain"):
         f = open(file_to_check, "r")
         file_type = "chain"
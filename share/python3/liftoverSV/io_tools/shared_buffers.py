@@ -0,0 +1,86 @@
+
+"""
+liftoverSV 0.3.1_beta
+=====================
+
+Copyright (C) 2024-current Veronique Geoffroy (veronique.geoffroy@inserm.fr)
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 3
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; If not, see <http://www.gnu.org/licenses/>.
+"""
+
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+from typing import Iterator, Tuple, Union
+
+
+# Buffers returned by the workers:
+# - small buffers: bytes (pickled with the results)
+# - large buffers: (name, size) of a shared memory block (no pickling, one copy)
+#
+# Usage:
+########
+# In the worker:
+#    payload = share_buffer(data, min_size)
+# In the main process:
+#    with open_buffer(payload) as data:
+#        f.write(data)
+# or, if the buffer is not needed (e.g. lift stopped on an error):
+#    release_buffer(payload)
+Payload = Union[bytes, Tuple[str, int]]
+
+
+def share_buffer(data: bytes, min_size: int) -> Payload:
+    """
+    Copy "data" into a new shared memory block if it is at least "min_size" bytes long
+    (0 = never), else return it as is.
+    The block is unlinked by "open_buffer" (in the process that reads it).
+    """
+    if not min_size or len(data) < min_size:
+        return data
+    shm = shared_memory.SharedMemory(create=True, size=len(data))
+    shm.buf[:len(data)] = data
+    name = shm.name
+    shm.close()
+    return name, len(data)
+
+
+@contextmanager
+def open_buffer(payload: Payload) -> Iterator[Union[bytes, memoryview]]:
+    """
+    Give access to a buffer returned by "share_buffer" (bytes or shared memory block).
+    The shared memory block is released and unlinked at the end of the "with" block.
+    """
+    if isinstance(payload, bytes):
+        yield payload
+        return
+
+    name, size = payload
+    # The reader unlinks the block: attach with the default tracking so that "unlink" also
+    # unregisters the name registered by the worker (same resource tracker, Python >= 3.13 included)
+    shm = shared_memory.SharedMemory(name=name)
+    view = shm.buf[:size]
+    try:
+        yield view
+    finally:
+        view.release()
+        shm.close()
+        shm.unlink()
+
+
+def release_buffer(payload: Payload):
+    """
+    Unlink the shared memory block of a buffer returned by "share_buffer" without reading it.
+    """
+    with open_buffer(payload):
+        pass
@@ -23,15 +23,47 @@ import gzip
 import heapq
 import tempfile
 import time
-from typing import List
+from functools import lru_cache
+from typing import List, Optional, Sequence
 from io_tools.file_utils import natural_sort_key, print_flush as print
-from io_tools.batch_writer import BatchWriter
+
+
+@lru_cache(maxsize=4096)
+def contig_sort_key(chrom: str):
+    """
+    Natural sort key of a contig (computed once for all the lines of the contig).
+    """
+    return tuple(natural_sort_key(chrom))
+
+
+def vcf_line_sort_key(line: str):
+    """
+    Sorting key (chrom, pos) of a VCF line (same order as `bcftools sort`).
+    """
+    chrom, pos, _ = line.split("\t", 2)
+    return contig_sort_key(chrom), int(pos)
+
+
+def write_sorted_chunk(lines: List[str], tmp_dir: Optional[str], suffix: str = ".chunk.vcf") -> str:
+    """
+    Sort VCF lines (stripped of the leading/trailing whitespaces, e.g. empty FORMAT column)
+    and write them to a new temporary file of "tmp_dir" (in one write), ready to be merged by VcfSorter.merge.
+
+    Returns:
+        str: Path of the temporary file
+    """
+    lines = sorted((line.strip() for line in lines), key=vcf_line_sort_key)
+    with tempfile.NamedTemporaryFile("w", delete=False, dir=tmp_dir, suffix=suffix) as f:
+        f.write("\n".join(lines) + "\n")
+    return f.name
+
 
 class VcfSorter:
     """
     Sort a VCF file by chromosome and position (like `bcftools sort`),
     while avoiding full in-memory loading. It uses a chunked + merge strategy.
     Each chunk is read, sorted, written to disk, and then all chunks are merged.
+    Chunks already sorted (see write_sorted_chunk) can also be merged directly (see merge).
 
     Supports optional append if file exists.
 
@@ -43,12 +75,12 @@ class VcfSorter:
     - overwrite=False:   the new content will be appended to the existing file (mode "at"), and the header is not rewritten to avoid duplicates.
     """
 
-    def __init__(self, vcf_to_sort: str, sorted_vcf: str, overwrite: bool = True):
+    def __init__(self, vcf_to_sort: Optional[str], sorted_vcf: str, overwrite: bool = True):
         """
         Initialize the sorter.
 
         Args:
-            vcf_to_sort (str): Path to the input (unsorted) VCF file.
+            vcf_to_sort (str): Path to the input (unsorted) VCF file (None if only sorted chunks are merged).
             sorted_vcf (str): Path to the output (sorted) VCF file (.vcf or .vcf.gz).
             overwrite (bool): If False, will append to the existing file instead of overwriting.
         """
@@ -70,21 +102,12 @@ class VcfSorter:
         Sort a chunk of variants in memory, then save it to a temporary gzipped VCF file.
 
         Args:
-            chunk (list): List of cyvcf2.Variant objects.
+            chunk (list): List of VCF lines (without newline).
             chunk_id (int): Identifier used to name the temporary file.
             g_liftoverSV
         """
-        # Sort by (chromosome, position) using natural sorting
-        chunk.sort(key=lambda line: (natural_sort_key(line.split("\t")[0]), int(line.split("\t")[1])))
-
-        # Create a temporary file for the sorted chunk
-        tmp_path = tempfile.NamedTemporaryFile(delete=False, dir=g_liftoverSV["tmp_dir"], suffix=f".chunk{chunk_id}.vcf").name
-
-        # Use BatchWriter to write lines efficiently with buffered I/O
-        writer = BatchWriter(tmp_path, g_liftoverSV)
-        for v in chunk:
-            writer.write(str(v).strip())
-        writer.close()
+        # Sort by (chromosome, position) using natural sorting and write the temporary file
+        tmp_path = write_sorted_chunk(chunk, g_liftoverSV["tmp_dir"], suffix=f".chunk{chunk_id}.vcf")
 
         # Keep track of all temp files to merge later
         self.temp_files.append(tmp_path)
@@ -117,18 +140,12 @@ class VcfSorter:
                 for h in header_lines:
                     out.write(h + "\n")
 
-            # Function to extract sorting key (chrom, pos) from a line of text
-            def line_key(line):
-                parts = line.strip().split("\t")
-                chrom, pos = parts[0], int(parts[1])
-                return (natural_sort_key(chrom), pos)
-
             # Initialize heap with the first line from each chunk
             heap = []
             for idx, reader in enumerate(readers):
                 line = reader.readline()
                 if line:
-                    heap.append((line_key(line), idx, line))
+                    heap.append((vcf_line_sort_key(line), idx, line))
             heapq.heapify(heap)  # build the min-heap based on (chrom, pos)
 
             # Merge process: always take the smallest line from heap
@@ -139,7 +156,7 @@ class VcfSorter:
                 # Read next line from the same file
                 next_line = readers[idx].readline()
                 if next_line:
-                    heapq.heappush(heap, (line_key(next_line), idx, next_line))
+                    heapq.heappush(heap, (vcf_line_sort_key(next_line), idx, next_line))
 
         # Close all readers and clean temporary files
         for r in readers:
@@ -187,3 +204,16 @@ class VcfSorter:
 
         # Once all chunks are saved, merge them into final sorted file
         self._merge_sorted_chunks(header_lines, g_liftoverSV)
+
+    # ----------------------------------------------------------
+    # Public method: merge chunks already sorted
+    # ----------------------------------------------------------
+    def merge(self, sorted_chunks: Sequence[str], g_liftoverSV):
+        """
+        Merge temporary files already sorted by chromosome and position (see write_sorted_chunk),
+        without reading and re-sorting a full VCF first. The temporary files are removed.
+        Equal (chrom, pos) lines are kept in the order of "sorted_chunks".
+        No header lines are written (use overwrite=False to append the lines to an existing header).
+        """
+        self.temp_files = list(sorted_chunks)
+        self._merge_sorted_chunks([], g_liftoverSV)
@@ -26,8 +26,9 @@ import shutil
 import argparse
 import tempfile
 from io_tools.file_utils import is_an_empty_vcf_file, file_with_chr, check_vcf_variant_line_format, print_flush as print
+from io_tools.fasta_readers import is_bgzf
 from functools import partial
-from core.constants import CHUNK_SIZE, N_WORKERS
+from core.constants import CHUNK_SIZE, N_WORKERS, LIFT_CACHE_SIZE, FASTA_CACHE_SIZE, MAX_INFLIGHT_CHUNKS
 
 
 def valid_vcf_input_file(vcf_input_file):
@@ -69,7 +70,7 @@ def valid_chain_file(chain_file):
     Validate the liftover chain file:
     - must exist
     - must not be empty
-    - must end with '.chain'
+    - must end with '.chain' or '.chain.gz'
     - must be consistent with the input VCF file (chr prefix)
     """
 
@@ -90,10 +91,10 @@ def valid_chain_file(chain_file):
         sys.exit(2)
 
     # Check extension
-    if not re.search(r"\.chain$", chain_file, re.IGNORECASE):
+    if not re.search(r"\.chain(\.gz)?$", chain_file, re.IGNORECASE):
         print("\n############################################################################")
         print(f"Bad option value: --chain = {chain_file}")
-        print("Extension file should be '.chain'")
+        print("Extension file should be '.chain' or '.chain.gz'")
         print("Exit with error.")
         print("############################################################################\n")
         sys.exit(2)
@@ -106,7 +107,8 @@ def valid_ref_fasta(ref_fasta):
     """
     Validate the reference FASTA file:
     - file must not be empty
-    - file must have .fasta or .fa extension
+    - file must have .fasta, .fa, .fasta.gz, .fa.gz or .2bit extension
+    - a gzipped file must be bgzip-compressed and indexed (.fai and .gzi)
     - file must exist
     """
     # Check if a path was provided
@@ -118,10 +120,10 @@ def valid_ref_fasta(ref_fasta):
         sys.exit(2)
 
     # Check valid extension
-    if not re.search(r"\.(fasta|fa)$", ref_fasta, re.IGNORECASE):
+    if not re.search(r"\.((fasta|fa)(\.gz)?|2bit)$", ref_fasta, re.IGNORECASE):
         print("\n############################################################################")
         print(f"Bad option value: --ref-fasta-seq = {ref_fasta}")
-        print("Extension file should be '.fasta' or '.fa'")
+        print("Extension file should be '.fasta', '.fa', '.fasta.gz', '.fa.gz' or '.2bit'")
         print("Exit with error.")
         print("############################################################################\n")
         sys.exit(2)
@@ -134,6 +136,24 @@ def valid_ref_fasta(ref_fasta):
         print("############################################################################\n")
         sys.exit(2)
 
+    # Check the compression and the indexes of a gzipped FASTA
+    if ref_fasta.lower().endswith(".gz"):
+        if not is_bgzf(ref_fasta):
+            print("\n############################################################################")
+            print(f"Bad option value: --ref-fasta-seq = {ref_fasta}")
+            print("A gzipped FASTA file should be compressed with bgzip (random access)")
+            print("Exit with error.")
+            print("############################################################################\n")
+            sys.exit(2)
+        for index_file in (ref_fasta + ".fai", ref_fasta + ".gzi"):
+            if not os.path.exists(index_file):
+                print("\n############################################################################")
+                print(f"Bad value for the --ref-fasta-seq option, index file does not exist ({index_file})")
+                print(f"Please, index the FASTA file with: samtools faidx {ref_fasta}")
+                print("Exit with error.")
+                print("############################################################################\n")
+                sys.exit(2)
+
     # If all checks pass, return the ref_fasta
     return ref_fasta
 
@@ -199,6 +219,56 @@ def valid_percent(value):
     return percent
 
 
+def valid_min_match(value):
+    """
+    Validate the min-match argument:
+    - must be a float
+    - must be in the [0, 1] range
+    """
+    try:
+        min_match = float(value)
+    except ValueError:
+        print(f"\nError: --min-match must be a float, got '{value}'")
+        sys.exit(2)
+
+    if not (0 <= min_match <= 1):
+        print("\n############################################################################")
+        print(f"Bad option value: --min-match = {min_match}")
+        print("Should be in the [0-1] range values, default = 0 (no filter)")
+        print("Exit with error.")
+        print("############################################################################\n")
+        sys.exit(2)
+
+    return min_match
+
+
+def valid_non_negative_int(option, default_message):
+    """
+    Return the validator of an integer option where 0 has a special meaning
+    ("--max-inflight-chunks", "--lift-cache-size", "--fasta-cache-size"):
+    - must be an integer
+    - must be >= 0 (e.g. a negative number of chunks would make the reading of the input VCF fail)
+    """
+    def valid_value(value):
+        try:
+            number = int(value)
+        except ValueError:
+            print(f"\nError: {option} must be an integer, got '{value}'")
+            sys.exit(2)
+
+        if number < 0:
+            print("\n############################################################################")
+            print(f"Bad option value: {option} = {number}")
+            print(f"Should be a positive integer or 0, {default_message}")
+            print("Exit with error.")
+            print("############################################################################\n")
+            sys.exit(2)
+
+        return number
+
+    return valid_value
+
+
 def valid_output_base_name(output_base_name):
     """
     Validate and normalize the output-file path.
@@ -260,14 +330,27 @@ def configure_liftover_sv(argv, g_liftoverSV):
     group_input.add_argument(
         "-c", "--chain",
         type=valid_chain_file,
+        nargs="+",
         required=True,
         metavar="<File>",
         help="""the liftover chain file
 see https://genome.ucsc.edu/goldenPath/help/chain.html for a description of chain files
 see http://hgdownload.soe.ucsc.edu/downloads.html#terms for where to download chain files
+gzipped chain file is supported
+several chain files can be given, they are composed in the given order
+(e.g. "-c hg18ToHg19.over.chain.gz hg19ToHg38.over.chain.gz" lifts from hg18 to hg38 in one pass)
 required"""
     )
 
+    group_input.add_argument(
+        "-I", "--index-dir", dest="index_dir",
+        type=str,
+        metavar="<Dir>",
+        help="""directory where the binary index of the chain file is cached
+(compiled at the first run, then memory-mapped by the next runs with the same chain file)
+default: directory of the chain file (or the temporary directory if not writable)"""
+    )
+
     group_input.add_argument(
         "-i", "--input-file", dest="input_file",
         metavar="<File>",
@@ -285,6 +368,7 @@ required"""
          required=True,
          metavar="<File>",
          help="""the reference sequence (fasta) for the TARGET genome build (i.e. the new one after the liftover)
+bgzip-compressed FASTA file (indexed with "samtools faidx") and UCSC .2bit file are supported
 required"""         
     )
 
@@ -310,6 +394,17 @@ default: current directory"""
 required"""
     )
 
+    group_output.add_argument(
+        "-U", "--unmapped-format", dest="unmapped_format",
+        choices=["text", "tsv", "counts"],
+        default="text",
+        help="""format of the FILE.unmapped output:
+- text: the first 7 columns of each unmapped SV and the reason
+- tsv: line number in the input VCF, case, reason code and its values ("." if none)
+- counts: only the number of unmapped SV for each case
+default: text"""
+    )
+
     # ───────────────────────────────────────────
     # 3) PERFORMANCE / PARALLELIZATION
     # ───────────────────────────────────────────
@@ -329,6 +424,32 @@ processing the VCF in chunks reduces memory usage and enables parallel liftover.
 default: 50000"""
     )
 
+    group_perf.add_argument(
+        "-M", "--max-inflight-chunks", dest="max_inflight_chunks",
+        type=valid_non_negative_int("--max-inflight-chunks", "default = 0 (twice the number of workers)"), default=MAX_INFLIGHT_CHUNKS,
+        help="""maximum number of chunks read from the input VCF and not yet written.
+the input VCF is read while the previous chunks are lifted: this bounds the memory usage.
+default: 0 (twice the number of workers)"""
+    )
+
+    group_perf.add_argument(
+        "-L", "--lift-cache-size", dest="lift_cache_size",
+        type=valid_non_negative_int("--lift-cache-size", "0 = no cache, default = 100000"), default=LIFT_CACHE_SIZE,
+        help="""maximum number of lifted coordinates memorized by each worker (LRU cache).
+repeated coordinates (e.g. same breakpoints in merged VCF) are lifted only once.
+0 to disable the cache.
+default: 100000"""
+    )
+
+    group_perf.add_argument(
+        "-F", "--fasta-cache-size", dest="fasta_cache_size",
+        type=valid_non_negative_int("--fasta-cache-size", "0 = no cache, default = 0"), default=FASTA_CACHE_SIZE,
+        help="""memory (MB) of the reference sequence cache of each worker (LRU cache of 64 kb blocks).
+reference blocks read again (e.g. SV hotspots) are served from memory.
+0 to disable the cache.
+default: 0"""
+    )
+
     # ───────────────────────────────────────────
     # 4) BEHAVIORAL PARAMETERS
     # ───────────────────────────────────────────
@@ -346,6 +467,16 @@ default: 50000"""
 default value: 0.05""" 
     )
 
+    group_behavior.add_argument(
+         "-m", "--min-match", dest="min_match",
+         type=valid_min_match,
+         default=0.0,
+         metavar="<float>",
+         help="""minimum ratio of the positions between POS and END that must be in aligned chain blocks
+for a lifted DEL, DUP or INV (as the -minMatch option of UCSC liftOver)
+default value: 0 (no filter)"""
+    )
+
     group_behavior.add_argument(
         "-T", "--tmp-dir", dest="tmp_dir",
         type=str,
@@ -396,6 +527,19 @@ default value: 0.05"""
         if not os.path.isdir(g_liftoverSV["tmp_dir"]):
             raise ValueError(f"Temporary directory does not exist: {g_liftoverSV['tmp_dir']}")
     
+    # Determine index_dir
+    #####################
+    if g_liftoverSV["index_dir"] is None:
+        chain_dir = os.path.dirname(os.path.abspath(g_liftoverSV["chain"][0]))
+        if os.access(chain_dir, os.W_OK):
+            g_liftoverSV["index_dir"] = chain_dir
+        else:
+            g_liftoverSV["index_dir"] = g_liftoverSV["tmp_dir"]
+    else:
+        # Ensure directory exists
+        if not os.path.isdir(g_liftoverSV["index_dir"]):
+            raise ValueError(f"Index directory does not exist: {g_liftoverSV['index_dir']}")
+
     # Determine output_dir if not given in argument
     ###############################################
     if g_liftoverSV["output_dir"] == None:
@@ -415,11 +559,12 @@ default value: 0.05"""
     # Cross-check "chr" prefix consistency between input-file and chain
     ##################################################################
     #chain_file = g_liftoverSV.get("chain", "")
-    if file_with_chr(args.input_file) != file_with_chr(args.chain):
+    # (the source build is the one of the first chain file)
+    if file_with_chr(args.input_file) != file_with_chr(args.chain[0]):
         print("\n############################################################################")
         print("Bad chain file:")
         print(f"- input file {file_with_chr(args.input_file)} prefix 'chr' ({args.input_file})")
-        print(f"- chain file {file_with_chr(args.chain)} prefix 'chr' ({args.chain})")
+        print(f"- chain file {file_with_chr(args.chain[0])} prefix 'chr' ({args.chain[0]})")
         print("Exit with error.")
         print("############################################################################\n")
         sys.exit(2)
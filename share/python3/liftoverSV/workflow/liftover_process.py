@@ -21,67 +21,167 @@ import os
 import sys
 import re
 import time
-import tempfile
+import threading
+from typing import Dict, NamedTuple, Optional, Set
 from io_tools.file_utils import open_any_text_file, print_flush as print, drop_info_fields, remove_tags_with_genomic_coordinates
 from io_tools.batch_writer import BatchWriter
 from io_tools.chain_lifter import ChainLifter
 from io_tools.fasta_extractor import FastaExtractor
+from io_tools.vcf_sorter import write_sorted_chunk
+from io_tools.shared_buffers import Payload, share_buffer, open_buffer, release_buffer
+from core.constants import SHARED_BUFFER_MIN_SIZE
 from core.liftover_engine import LiftoverEngine, Variant
+from core.unmapped_reasons import render_unmapped, render_unmapped_tsv
 from core.header_tools import extract_header_ids
 from workflow.output_writer import add_new_header_lines, sort_and_compress_the_lifted_vcf
 from multiprocessing import Pool, cpu_count
 
-def process_chunk(chunk, g_liftoverSV):
+# Per-worker state
+##################
+# Filled once in each pool process by "init_worker" and reused for every chunk
+# processed by this worker (the chain file is parsed and the FASTA is opened only once per worker)
+g_worker = {}
+
+
+def init_worker(g_liftoverSV, shared_index=None):
+    """
+    Pool initializer: executed once in each worker process when the pool starts.
+
+    It:
+      - Keeps a reference to g_liftoverSV (sent once to each worker instead of with every chunk)
+      - Opens the chain index (ChainLifter): memory-mapped from its file on disk (the pages are shared
+        by all the workers through the page cache), or attached to the shared memory block published
+        by the main process if the index could not be saved on disk
+      - Opens the FASTA file (FastaExtractor)
+      - Initializes the LiftoverEngine reused for all the chunks of this worker
+
+    Parameters
+    ----------
+    g_liftoverSV : dict
+    shared_index : dict
+        Handle of the chain index in shared memory (see ChainIndex.share), None if the index is on disk
+    """
+    # Open the chain index (no copy: all the workers share the same memory)
+    chain = ChainLifter(g_liftoverSV['chain'], g_liftoverSV.get('chain_index_path'), shared_index,
+                        cache_size=g_liftoverSV["lift_cache_size"])
+
+    # Open the reference (see FastaExtractor): FASTA memory-mapped with its .fai index,
+    # bgzip-compressed FASTA (.fai + .gzi) or .2bit. pyfaidx only creates a missing .fai
+    extractor = FastaExtractor(g_liftoverSV["ref_fasta_seq"], cache_size=g_liftoverSV["fasta_cache_size"] * 1024 * 1024)
+
+    g_worker["g_liftoverSV"] = g_liftoverSV
+    g_worker["engine"] = LiftoverEngine(chain, extractor, g_liftoverSV["percent"], g_liftoverSV["min_match"])
+
+
+class ChunkResult(NamedTuple):
+    """
+    Results of a chunk returned by "process_chunk" to the main process
+    """
+    # Temporary file of the lifted VCF lines, sorted by (chrom, pos) (None if no SV lifted)
+    sorted_chunk: Optional[str]
+    n_mapped: int
+    # Lines of the unmapped file, joined and encoded (empty with "--unmapped-format counts")
+    unmapped: Payload
+    # Number of unmapped SV (whatever the "--unmapped-format")
+    n_unmapped: int
+    case_counts: Dict[str, int]
+    S_SVlines_INFO: Set[str]
+    S_SVlines_FORMAT: Set[str]
+    S_SVlines_FILTER: Set[str]
+    S_lifted_contigs: Set[str]
+
+
+def encode_lines(lines):
+    """
+    Join and encode lines of output (one single buffer: bulk pickling/write instead of one string per line).
+    Buffers larger than SHARED_BUFFER_MIN_SIZE are returned through shared memory (see io_tools/shared_buffers.py).
+    """
+    if not lines:
+        return b""
+    return share_buffer(("\n".join(lines) + "\n").encode("utf-8"), SHARED_BUFFER_MIN_SIZE)
+
+
+def process_chunk(chunk):
     """
     Process a single chunk of VCF lines by performing the liftover operation.
 
-    This function is executed in parallel by worker processes.  
+    This function is executed in parallel by worker processes
+    (initialized with "init_worker").
     For each chunk, it:
-      - Initializes a local ChainLifter, FastaExtractor, and LiftoverEngine instance
+      - Resets the counters of the worker LiftoverEngine
       - Converts each VCF line into a Variant object
-      - Applies the liftover transformation to each variant
-      - Collects both lifted and unmapped variants
-      - Returns the results along with metadata collected by the LiftoverEngine
+      - Reads the lifted REF of the chunk in coordinate order (prefetch)
+      - Applies the liftover transformation to the variants (see LiftoverEngine.lift_chunk)
+      - Sorts the lifted lines by (chrom, pos) and writes them to a temporary file of "--tmp-dir"
+        (only merged at the end, see "sort_and_compress_the_lifted_vcf")
+      - Renders the unmapped lines (see "--unmapped-format") into an encoded buffer
+      - Returns them along with metadata collected by the LiftoverEngine
 
     Parameters
     ----------
     chunk : list of tuple(int, str)
         A list of (line_number, vcf_line) pairs 
-    g_liftoverSV : dict
    
     Returns
     -------
-    tuple
-        A tuple containing:
-        - results: list of (lifted_variant, reason) pairs
-        - S_SVlines_INFO  : set of INFO IDs extracted from lifted variants
-        - S_SVlines_FORMAT: set of FORMAT IDs extracted from lifted variants
-        - S_SVlines_FILTER: set of FILTER IDs extracted from lifted variants
-        - S_lifted_contigs: set of contigs observed during liftover
-        - case_counts     : dict with counts for different SV categories
-        - n_mapped        : number of successfully lifted variants
-        - n_unmapped      : number of unmapped variants
+    ChunkResult
+        The sorted chunk of lifted lines, the unmapped lines (encoded buffer), the counters (n_mapped, n_unmapped, case_counts)
+        and the INFO/FORMAT/FILTER IDs and contigs of the lifted variants
     """    
-    # Load the chain file
-    chain = ChainLifter(g_liftoverSV['chain'])
+    g_liftoverSV = g_worker["g_liftoverSV"]
+    engine = g_worker["engine"]
 
-    # Load FASTA with pyfaidx: uses .fai index if available
-    extractor = FastaExtractor(g_liftoverSV["ref_fasta_seq"])
+    # Counters and sets are returned for each chunk
+    engine.reset_counters()
 
-    # Initialise the LiftoverEngine
-    engine = LiftoverEngine(chain, extractor, g_liftoverSV["percent"])
+    # Create a Variant object from each line
+    variants = [Variant.from_vcf_line(line, line_number) for line_number, line in chunk]
 
-    results = []
-    for line_number, line in chunk:
-        # Create a Variant object from the line
-        variant = Variant.from_vcf_line(line, line_number)
-        # Lift the variant
-        lifted, reason = engine.lift_variant(variant, g_liftoverSV)
-        # Memorize the results
-        results.append((lifted, reason))
+    # Read the reference sequences of the chunk in coordinate order (sequential instead of random I/O)
+    engine.prefetch_reference(variants)
 
-    return results, engine.S_SVlines_INFO, engine.S_SVlines_FORMAT, engine.S_SVlines_FILTER, engine.S_lifted_contigs, engine.case_counts, engine.n_mapped, engine.n_unmapped
+    # Lift the variants (column by column for the angle-bracketed ALT, else one by one)
+    results = engine.lift_chunk(variants, g_liftoverSV)
 
+    # Render the output lines
+    unmapped_format = g_liftoverSV["unmapped_format"]
+    lifted_lines = []
+    unmapped_lines = []
+    for v, (lifted_variant, reason) in zip(variants, results):
+        if lifted_variant:
+            lifted_lines.append(lifted_variant)
+        elif unmapped_format == "text":
+            unmapped_lines.append(render_unmapped(v.var_head, reason))
+        elif unmapped_format == "tsv":
+            unmapped_lines.append(render_unmapped_tsv(reason))
+
+    # Sorted run of the lifted lines
+    sorted_chunk = write_sorted_chunk(lifted_lines, g_liftoverSV["tmp_dir"], suffix=".liftoverSV.tmp.vcf") if lifted_lines else None
+
+    return ChunkResult(
+        sorted_chunk, len(lifted_lines),
+        encode_lines(unmapped_lines), engine.n_unmapped,
+        engine.case_counts, engine.S_SVlines_INFO, engine.S_SVlines_FORMAT, engine.S_SVlines_FILTER, engine.S_lifted_contigs
+    )
+
+
+def release_results(results):
+    """
+    Release the results of "process_chunk" that will not be written (lift stopped on an error):
+    unlink their shared memory buffers and remove their sorted chunks.
+    Waits for the chunks still being lifted (at most "max_inflight_chunks", the reading is stopped).
+    """
+    while True:
+        try:
+            result = next(results)
+        except StopIteration:
+            return
+        except Exception:
+            # Chunk failed in the worker: nothing to release
+            continue
+        release_buffer(result.unmapped)
+        if result.sorted_chunk:
+            os.remove(result.sorted_chunk)
 
 
 # Source:
@@ -151,11 +251,10 @@ def write_the_lifted_vcf(g_liftoverSV):
         - The REF sequence differs from the original after liftover (see REF and ALT)                                                                                                                                                                    
     """
 
-    # Create a temporary VCF output file for mapped variants unsort (no header lines)
-    print(f"[{time.strftime('%H:%M:%S')}] Initializing a temporary VCF output file for unsorted mapped variants")
-    tmp_output_file = tempfile.NamedTemporaryFile(delete=False, dir=g_liftoverSV["tmp_dir"], suffix=f".liftoverSV.tmp.vcf").name
-    print(f"           {tmp_output_file}")
-    tmp_out_writer = BatchWriter(tmp_output_file, g_liftoverSV)    
+    # The mapped variants of each chunk are sorted and written by the workers in temporary files
+    # (no header lines), merged at the end (see "sort_and_compress_the_lifted_vcf")
+    tmp_dir = g_liftoverSV["tmp_dir"]
+    sorted_chunks = []
 
     # Initialize a BatchWriter for the unmapped file
     print(f"[{time.strftime('%H:%M:%S')}] Initializing the output unmapped file")
@@ -178,14 +277,10 @@ def write_the_lifted_vcf(g_liftoverSV):
     # - Existing IDs are preserved.
     # ==> use the "vcf_line_number" variable (to later create "lifted_from_l_<line_number>" indices)
     print(f"[{time.strftime('%H:%M:%S')}] Lift over SV:")
-    print(f"           Writing to {tmp_output_file}")
+    print(f"           Writing sorted chunks to {tmp_dir}")
     print(f"           Writing to {unmapped_file}")
     at_least_1_SV_lifted = 0
 
-    # Collect lines to parallelize
-    L_chunks = []
-    chunk = []
-
     # Initialize variables to update the header lines
     S_header_INFO, S_header_FORMAT, S_header_FILTER = set(), set(), set()
     S_SVlines_INFO, S_SVlines_FORMAT, S_SVlines_FILTER = set(), set(), set()
@@ -195,8 +290,6 @@ def write_the_lifted_vcf(g_liftoverSV):
     n_unmapped = 0
     case_counts = {f"case{i}": 0 for i in range(1, 6)}
     
-    new_line = ""
-    
     if g_liftoverSV["remove_coordinates"]:
         tags=remove_tags_with_genomic_coordinates(input_file)
     else:
@@ -208,26 +301,6 @@ def write_the_lifted_vcf(g_liftoverSV):
     else:
         g_liftoverSV["drop_info_fields"]=tags
 
-    
-    with open_any_text_file(input_file) as f:
-        for vcf_line_number, line in enumerate(f, 1):
-
-            if line.startswith("#"):
-                # Updade S_header_INFO, S_header_FORMAT and S_header_FILTER
-                S_header_INFO, S_header_FORMAT, S_header_FILTER = extract_header_ids(line, S_header_INFO, S_header_FORMAT, S_header_FILTER)
-            else:
-                new_line = drop_info_fields(line, g_liftoverSV)
-                chunk.append((vcf_line_number, new_line))
-                if len(chunk) >= g_liftoverSV["chunk_size"]:
-                    L_chunks.append(chunk)
-                    chunk = []                  
-        if chunk:
-            L_chunks.append(chunk)
-
-    total_chunks = len(L_chunks)
-    print(f"[{time.strftime('%H:%M:%S')}] Processing {total_chunks} chunks (target chunk size: {g_liftoverSV['chunk_size']} lines)")
-
-
     # Determine the number of workers to use: 
     # - value from g_liftoverSV if provided
     # - otherwise default to the number of CPU cores
@@ -236,46 +309,116 @@ def write_the_lifted_vcf(g_liftoverSV):
     n_workers = g_liftoverSV.get("n_workers", cpu_count())
     if n_workers > cpu_count():
        n_workers = cpu_count() 
-    
-    # Prepare the tuples
-    args = [(chunk, g_liftoverSV) for chunk in L_chunks]
-    
-    i_chunk = 1
-    with Pool(n_workers) as pool:
-        for (
-            result_batch,
-            Si_SVlines_INFO,
-            Si_SVlines_FORMAT,
-            Si_SVlines_FILTER,
-            Si_lifted_contigs,
-            i_case_counts,
-            ni_mapped,
-            ni_unmapped
-        ) in pool.starmap(process_chunk, args):
-            if g_liftoverSV["verbose"]:
-                print(f"[{time.strftime('%H:%M:%S')}] Chunk {i_chunk}/{total_chunks}")
-            i_chunk += 1
-
-            for lifted_variant, reason in result_batch:
-                if lifted_variant:
-                    # Liftover successfull
-                    tmp_out_writer.write(lifted_variant)
-                    at_least_1_SV_lifted = 1 
-                else:
-                    # Unmapped
-                    unmapped_writer.write(reason)
-
-            S_SVlines_INFO.update(Si_SVlines_INFO)
-            S_SVlines_FORMAT.update(Si_SVlines_FORMAT)
-            S_SVlines_FILTER.update(Si_SVlines_FILTER)
-            S_lifted_contigs.update(Si_lifted_contigs)
-            n_mapped += ni_mapped
-            n_unmapped += ni_unmapped
-            case_counts = {k: case_counts.get(k, 0) + i_case_counts.get(k, 0) for k in set(case_counts) | set(i_case_counts)}
 
-    
+    # Maximum number of chunks read but not yet written (backpressure on the VCF reading)
+    max_inflight_chunks = g_liftoverSV["max_inflight_chunks"] or 2 * n_workers
+
+    # One copy of the chain index whatever the number of workers and the start method:
+    # - the workers memory-map the index saved on disk by "prepare_chain_index"
+    #   (read-only pages shared through the page cache, only the pages of the lifted contigs are read)
+    # - if the index could not be saved, its arrays are published in shared memory and the workers attach to it
+    # The whole index is shared: the input VCF is streamed and its contigs are not known before the lift
+    # (the ##contig header lines can be missing or incomplete, and a second pass over the input
+    # would double the reading of large VCF)
+    shm, shared_index = None, None
+    if g_liftoverSV["chain_index_path"] is None:
+        shm, shared_index = g_liftoverSV["chain_index"].share()
+    # The workers get g_liftoverSV without the index itself
+    worker_g_liftoverSV = {key: value for key, value in g_liftoverSV.items() if key != "chain_index"}
+
+    # Chunks of (vcf_line_number, line) are read while the previous ones are lifted:
+    # "inflight_chunks" is acquired before reading a chunk and released once its results are written
+    inflight_chunks = threading.Semaphore(max_inflight_chunks)
+    stop_reading = threading.Event()
+
+    unmapped_format = g_liftoverSV["unmapped_format"]
+
+    def read_chunks():
+        """
+        Generator of the chunks of the input VCF (run by the task handler thread of the pool).
+        The header lines update S_header_INFO, S_header_FORMAT and S_header_FILTER.
+        """
+        nonlocal S_header_INFO, S_header_FORMAT, S_header_FILTER
+        chunk = []
+        with open_any_text_file(input_file) as f:
+            for vcf_line_number, line in enumerate(f, 1):
+                if line.startswith("#"):
+                    # Updade S_header_INFO, S_header_FORMAT and S_header_FILTER
+                    S_header_INFO, S_header_FORMAT, S_header_FILTER = extract_header_ids(line, S_header_INFO, S_header_FORMAT, S_header_FILTER)
+                    continue
+                if not chunk:
+                    # Wait until less than "max_inflight_chunks" chunks are being processed
+                    inflight_chunks.acquire()
+                    if stop_reading.is_set():
+                        return
+                chunk.append((vcf_line_number, drop_info_fields(line, g_liftoverSV)))
+                if len(chunk) >= g_liftoverSV["chunk_size"]:
+                    yield chunk
+                    chunk = []
+        if chunk:
+            yield chunk
+
+    print(f"[{time.strftime('%H:%M:%S')}] Processing chunks of {g_liftoverSV['chunk_size']} lines (at most {max_inflight_chunks} chunks in memory)")
+
+    # g_liftoverSV, the chain index and the FASTA file are loaded only once per worker (see "init_worker")
+    # The results are written as soon as they arrive (in the order of the input VCF)
+    i_chunk = 0
+    try:
+        with Pool(n_workers, initializer=init_worker, initargs=(worker_g_liftoverSV, shared_index)) as pool:
+            results = pool.imap(process_chunk, read_chunks())
+            try:
+                for result in results:
+                    i_chunk += 1
+                    if g_liftoverSV["verbose"]:
+                        print(f"[{time.strftime('%H:%M:%S')}] Chunk {i_chunk}")
+
+                    # The lifted lines are already sorted and written by the worker
+                    if result.sorted_chunk:
+                        sorted_chunks.append(result.sorted_chunk)
+                    # The unmapped lines are already joined by the worker: one write per chunk
+                    # (no line with "--unmapped-format counts": only the counts are written at the end)
+                    with open_buffer(result.unmapped) as data:
+                        unmapped_writer.write_bytes(data, result.n_unmapped if unmapped_format != "counts" else 0)
+                    if result.n_mapped:
+                        # Liftover successfull
+                        at_least_1_SV_lifted = 1
+                    # The next chunk can be read
+                    inflight_chunks.release()
+
+                    S_SVlines_INFO.update(result.S_SVlines_INFO)
+                    S_SVlines_FORMAT.update(result.S_SVlines_FORMAT)
+                    S_SVlines_FILTER.update(result.S_SVlines_FILTER)
+                    S_lifted_contigs.update(result.S_lifted_contigs)
+                    n_mapped += result.n_mapped
+                    n_unmapped += result.n_unmapped
+                    case_counts = {k: case_counts.get(k, 0) + result.case_counts.get(k, 0) for k in set(case_counts) | set(result.case_counts)}
+            except Exception:
+                # Stop the reading, then release the buffers of the chunks already lifted but not written
+                stop_reading.set()
+                inflight_chunks.release()
+                release_results(results)
+                for sorted_chunk in sorted_chunks:
+                    os.remove(sorted_chunk)
+                raise
+            finally:
+                # Unblock the reading of the chunks if the lift stopped on an error
+                # (before the pool termination, which waits for the end of the reading)
+                stop_reading.set()
+                inflight_chunks.release()
+    finally:
+        # Release the shared chain index
+        if shm is not None:
+            shm.close()
+            shm.unlink()
+
+    print(f"[{time.strftime('%H:%M:%S')}] {i_chunk} chunks processed")
+
+    if unmapped_format == "counts":
+        # Only the number of unmapped SV for each case
+        for case in sorted(case_counts):
+            unmapped_writer.write(f"{case}\t{case_counts[case]}")
+
     # Close and flush the remaining lines:
-    tmp_out_writer.close()
     unmapped_writer.close()
 
     print(f"[{time.strftime('%H:%M:%S')}] Liftover summary:")
@@ -313,7 +456,7 @@ def write_the_lifted_vcf(g_liftoverSV):
     # => creation of g_liftoverSV['output_file']
     add_new_header_lines(S_new_INFO, S_new_FORMAT, S_new_FILTER, S_lifted_contigs, input_file, g_liftoverSV)
    
-    # Sort the output file
-	######################
-    sort_and_compress_the_lifted_vcf(tmp_output_file, g_liftoverSV)
+    # Merge the sorted chunks into the output file
+	##############################################
+    sort_and_compress_the_lifted_vcf(sorted_chunks, g_liftoverSV)
 
@@ -230,24 +230,17 @@ def add_new_header_lines(S_new_INFO, S_new_FORMAT, S_new_FILTER, S_lifted_contig
 
 
 
-def sort_and_compress_the_lifted_vcf(tmp_output_file, g_liftoverSV):
+def sort_and_compress_the_lifted_vcf(sorted_chunks, g_liftoverSV):
     """
     Do not modify the header in g_liftoverSV['output_file'].
-    Sort and compress the tmp output VCF file and write variant lines to g_liftoverSV['output_file']
+    Merge the sorted chunks of lifted variant lines (written by the workers, see "process_chunk")
+    and write them compressed to g_liftoverSV['output_file'] (the sorted chunks are removed)
     """
 
-    # Sort and compress the output file 
+    # Merge the sorted chunks and compress the output file
     sorter = VcfSorter(
-        vcf_to_sort=tmp_output_file,
+        vcf_to_sort=None,
         sorted_vcf=g_liftoverSV['output_file'],
         overwrite=False
     )
-    sorter.sort(g_liftoverSV)
-
-    # Clean: remove tmp output if output_file exists
-    if os.path.exists(g_liftoverSV['output_file']):
-        try:
-            print(f"[{time.strftime('%H:%M:%S')}] Removing {tmp_output_file}")
-            os.remove(tmp_output_file)
-        except OSError as e:
-            print(f"Warning: cannot remove {tmp_output_file}: {e}")
+    sorter.merge(sorted_chunks, g_liftoverSV)
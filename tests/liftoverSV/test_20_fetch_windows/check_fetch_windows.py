@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+
+# Check the merged windows of FastaExtractor.get_sequences / FastaExtractor.prefetch:
+# - no merged window longer than "max_window_size" (except a single longer fetch)
+# - same sequences as one fetch per record
+#
+# Command line example:
+# python3 ./check_fetch_windows.py ./output/synthetic.fa
+
+import os
+import sys
+import random
+
+sys.path.insert(0, os.path.join(os.environ["LIFTOVERSV"], "share", "python3", "liftoverSV"))
+from io_tools.fasta_extractor import FastaExtractor
+
+
+MERGE_DISTANCE = 4096
+MAX_WINDOW_SIZE = 10000
+
+
+def write_fasta(fasta_path, contig_sizes, line_width=60):
+    """
+    Write a random FASTA file (the .fai index is created by FastaExtractor).
+    """
+    rng = random.Random(12)
+    with open(fasta_path, "w") as f:
+        for chrom, size in contig_sizes.items():
+            seq = "".join(rng.choice("ACGTacgtN") for _ in range(size))
+            f.write(f">{chrom}\n")
+            for i in range(0, size, line_width):
+                f.write(seq[i:i + line_width] + "\n")
+
+
+def main(fasta_path):
+    contig_sizes = {"chr1": 300000, "chr2": 50000}
+    for path in (fasta_path, fasta_path + ".fai"):
+        if os.path.exists(path):
+            os.remove(path)
+    write_fasta(fasta_path, contig_sizes)
+
+    # Dense chunk: 1-base REF every 100 bp (all closer than MERGE_DISTANCE), a few long REF
+    # and some fetches that can't be merged (out of the contig, unknown contig)
+    fetches = [("chr1", pos, pos) for pos in range(1, 300000, 100)]
+    fetches += [("chr2", pos, pos + 20) for pos in range(1, 49000, 700)]
+    fetches += [("chr1", 150000, 175000), ("chr2", 10, 30000)]
+    fetches += [("chr1", 299990, 300010), ("chrUn", 10, 10)]
+    random.Random(3).shuffle(fetches)
+
+    errors = []
+    extractor = FastaExtractor(fasta_path, merge_distance=MERGE_DISTANCE, max_window_size=MAX_WINDOW_SIZE)
+
+    windows, others = extractor._merge_windows(fetches)
+    for chrom, window_start, window_end, indices in windows:
+        if window_end - window_start + 1 > MAX_WINDOW_SIZE and len(indices) > 1:
+            errors.append(f"Window {chrom}:{window_start}-{window_end} longer than {MAX_WINDOW_SIZE} bp")
+    if len(others) != 2:
+        errors.append(f"{len(others)} fetches not merged (expected: 2)")
+
+    # Reference: one fetch per record
+    expected = []
+    for chrom, start, end in fetches:
+        try:
+            expected.append(extractor.get_sequence(chrom, start, end))
+        except ValueError:
+            expected.append(None)
+
+    def get_sequence(chrom, start, end):
+        try:
+            return extractor.get_sequence(chrom, start, end)
+        except ValueError:
+            return None
+
+    known = [i for i, fetch in enumerate(fetches) if fetch[0] in contig_sizes]
+    sequences = extractor.get_sequences([fetches[i] for i in known])
+    if sequences != [expected[i] for i in known]:
+        errors.append("get_sequences: not the expected sequences")
+
+    extractor.prefetch(fetches)
+    if [get_sequence(*fetch) for fetch in fetches] != expected:
+        errors.append("prefetch: not the expected sequences")
+
+    # Sequences kept in memory by prefetch: no longer than MAX_WINDOW_SIZE or than the longest fetch
+    longest_fetch = max(end - start + 1 for chrom, start, end in fetches)
+    longest_window = max(len(seq) for _, _, seqs in extractor.prefetched.values() for seq in seqs)
+    if longest_window > max(MAX_WINDOW_SIZE, longest_fetch):
+        errors.append(f"prefetch: window of {longest_window} bp in memory")
+
+    if errors:
+        print("\n".join(errors))
+        print(os.path.basename(os.getcwd()) + ": ERROR, not the expected values")
+    else:
+        print(f"{len(windows)} windows (at most {MAX_WINDOW_SIZE} bp) for {len(fetches)} fetches")
+        print("ok - Finished")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1])
@@ -0,0 +1,18 @@
+#!/bin/bash 
+
+set -eo pipefail
+
+
+chain=$1
+ref_fasta_seq=$2
+
+# Synthetic FASTA (the $chain and $ref_fasta_seq files are not used):
+# - Dense chunk: 1-base REF every 100 bp on a 300 kb contig
+#   => merged windows of reference fetches (FastaExtractor.prefetch) must not exceed
+#      the maximum window size (10 kb in this test)
+# - Same sequences as one fetch per record
+
+mkdir -p ./output
+rm -f ./output/synthetic.fa*
+
+python3 ./check_fetch_windows.py ./output/synthetic.fa
@@ -0,0 +1,47 @@
+#!/bin/bash
+
+set -eo pipefail
+
+
+chain=$1
+ref_fasta_seq=$2
+
+# Synthetic chain and FASTA files (the $chain and $ref_fasta_seq files are not used):
+# - ../synthetic_data/hg19ToHg38.synthetic.chain
+# - ../synthetic_data/hg38.synthetic.fa
+#
+# chr1:8001-8500 (hg19) is a gap of the chain (not aligned)
+
+# INPUT:
+########
+
+# #CHROM  POS     ID      REF     ALT     QUAL    FILTER  INFO    FORMAT  NORMAL  TUMOR
+# chr1    4001    del_small_gap   N       <DEL>   .       PASS    END=16001;SVTYPE=DEL;SVLEN=-12000       GT      0/0     0/1
+# chr1    6001    dup_small_gap   N       <DUP>   .       PASS    END=19001;SVTYPE=DUP;SVLEN=13000        GT      0/0     0/1
+# chr1    8601    inv_aligned     N       <INV>   .       PASS    END=12001;SVTYPE=INV;SVLEN=3400 GT      0/0     0/1
+
+# Positions between POS and END in aligned chain blocks:
+#	=> del_small_gap: 11501/12001 = 0.958 => unmapped with "-m 0.96" (case 4)
+#	=> dup_small_gap: 12501/13001 = 0.962 => lifted
+#	=> inv_aligned: 1 => lifted
+
+
+mkdir -p ./output
+rm -rf ./output/output_hg38.* ./output/*.lsvidx
+
+python3 $LIFTOVERSV/bin/liftoverSV.py -i ../synthetic_data/input_hg19.vcf -o ./output/output_hg38.vcf -c ../synthetic_data/hg19ToHg38.synthetic.chain -r ../synthetic_data/hg38.synthetic.fa -I ./output -m 0.96
+
+
+# The command line and the reference path depend on the installation
+compare=`diff <(zcat ./output/output_hg38.sort.vcf.gz | grep -v "^##liftoverSV_command=\|^##reference=") <(zcat ./validated_output/validated_output_hg38.sort.vcf.gz | grep -v "^##liftoverSV_command=\|^##reference=") || true`
+compare+=`diff ./output/output_hg38.unmapped validated_output/validated_output_hg38.unmapped || true`
+
+
+if [ "$compare" ]
+then
+        echo "$compare"
+        echo `basename $(pwd)`": ERROR, not the expected values"
+else
+        echo "ok - Finished"
+fi
+
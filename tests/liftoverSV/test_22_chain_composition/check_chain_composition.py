@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+
+# Check the composition of several chain files (e.g. "-c hg19ToHg38.chain hg38ToHs1.chain"):
+# every position of the source contigs must be lifted by the composed chain index
+# to the same position as two successive lifts (or not lifted by both)
+#
+# Command line example:
+# python3 ./check_chain_composition.py ../synthetic_data/hg19ToHg38.synthetic.chain ../synthetic_data/hg38ToHs1.synthetic.chain
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.environ["LIFTOVERSV"], "share", "python3", "liftoverSV"))
+import numpy as np
+from io_tools.chain_lifter import ChainLifter
+
+
+def main(chain_file_1, chain_file_2):
+    first = ChainLifter(chain_file_1)
+    second = ChainLifter(chain_file_2)
+    composed = ChainLifter([chain_file_1, chain_file_2])
+
+    # Source contigs of the first chain file (+ 1 unknown contig)
+    contig_sizes = {}
+    with open(chain_file_1) as f:
+        for line in f:
+            if line.startswith("chain"):
+                fields = line.split()
+                contig_sizes[fields[2]] = int(fields[3])
+    contig_sizes["chrUnknown"] = 1000
+
+    errors = []
+    n_positions = n_lifted = 0
+    for chrom, size in contig_sizes.items():
+        positions = list(range(1, size + 1))
+        expected = []
+        for pos in positions:
+            mid_chrom, mid_pos = first.lift(chrom, pos)
+            expected.append(second.lift(mid_chrom, mid_pos) if mid_chrom is not None else (None, None))
+
+        # One by one
+        lifted = [composed.lift(chrom, pos) for pos in positions]
+        for pos, result, expected_result in zip(positions, lifted, expected):
+            if result != expected_result:
+                errors.append(f"lift {chrom}:{pos} => {result} (expected: {expected_result})")
+
+        # Batch
+        new_contig_ids, new_positions = composed.lift_many(composed.contig_ids([chrom] * size), np.array(positions))
+        batch = list(zip(composed.target_contig_names(new_contig_ids), new_positions.tolist()))
+        batch = [(c, p) if c is not None else (None, None) for c, p in batch]
+        if batch != expected:
+            errors.append(f"lift_many {chrom}: not the expected values")
+
+        n_positions += size
+        n_lifted += sum(1 for c, _ in expected if c is not None)
+
+    if errors:
+        print("\n".join(errors[:20]))
+        print(os.path.basename(os.getcwd()) + ": ERROR, not the expected values")
+    else:
+        print(f"{n_lifted}/{n_positions} positions lifted by both chain files")
+        print("ok - Finished")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1], sys.argv[2])
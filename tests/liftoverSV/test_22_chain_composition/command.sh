@@ -0,0 +1,43 @@
+#!/bin/bash
+
+set -eo pipefail
+
+
+chain=$1
+ref_fasta_seq=$2
+
+# Synthetic chain and FASTA files (the $chain and $ref_fasta_seq files are not used):
+# - ../synthetic_data/hg19ToHg38.synthetic.chain
+# - ../synthetic_data/hg38ToHs1.synthetic.chain
+# - ../synthetic_data/hs1.synthetic.fa
+#
+# Two chain files composed in the given order: "-c hg19ToHg38.synthetic.chain hg38ToHs1.synthetic.chain"
+# (gaps, "-" strand and overlapping chains in both chain files)
+#
+# 1 - Every position of the hg19 contigs is lifted to the same position as two successive lifts
+#     (hg19 => hg38 => hs1), one by one (ChainLifter.lift) and in batch (ChainLifter.lift_many)
+# 2 - Liftover of the input VCF from hg19 to hs1 in one pass
+
+
+mkdir -p ./output
+rm -rf ./output/output_hs1.* ./output/*.lsvidx
+
+check=`python3 ./check_chain_composition.py ../synthetic_data/hg19ToHg38.synthetic.chain ../synthetic_data/hg38ToHs1.synthetic.chain`
+echo "$check"
+
+python3 $LIFTOVERSV/bin/liftoverSV.py -i ../synthetic_data/input_hg19.vcf -o ./output/output_hs1.vcf -c ../synthetic_data/hg19ToHg38.synthetic.chain ../synthetic_data/hg38ToHs1.synthetic.chain -r ../synthetic_data/hs1.synthetic.fa -I ./output
+
+
+# The command line and the reference path depend on the installation
+compare=`diff <(zcat ./output/output_hs1.sort.vcf.gz | grep -v "^##liftoverSV_command=\|^##reference=") <(zcat ./validated_output/validated_output_hs1.sort.vcf.gz | grep -v "^##liftoverSV_command=\|^##reference=") || true`
+compare+=`diff ./output/output_hs1.unmapped validated_output/validated_output_hs1.unmapped || true`
+
+
+if [ "$compare" ] || [[ "$check" != *"ok - Finished"* ]]
+then
+        echo "$compare"
+        echo `basename $(pwd)`": ERROR, not the expected values"
+else
+        echo "ok - Finished"
+fi
+
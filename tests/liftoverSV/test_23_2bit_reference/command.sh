@@ -0,0 +1,35 @@
+#!/bin/bash
+
+set -eo pipefail
+
+
+chain=$1
+ref_fasta_seq=$2
+
+# Synthetic chain and reference files (the $chain and $ref_fasta_seq files are not used):
+# - ../synthetic_data/hg19ToHg38.synthetic.chain
+# - ../synthetic_data/hg38.synthetic.2bit: UCSC .2bit file (with N blocks and soft-masked lowercase blocks)
+#
+# The validated output has been created with the same reference in FASTA format (hg38.synthetic.fa)
+# => same lifted REF/ALT sequences with the .2bit file
+
+
+mkdir -p ./output
+rm -rf ./output/output_hg38.* ./output/*.lsvidx
+
+python3 $LIFTOVERSV/bin/liftoverSV.py -i ../synthetic_data/input_hg19.vcf -o ./output/output_hg38.vcf -c ../synthetic_data/hg19ToHg38.synthetic.chain -r ../synthetic_data/hg38.synthetic.2bit -I ./output
+
+
+# The command line and the reference path depend on the installation
+compare=`diff <(zcat ./output/output_hg38.sort.vcf.gz | grep -v "^##liftoverSV_command=\|^##reference=") <(zcat ./validated_output/validated_output_hg38.sort.vcf.gz | grep -v "^##liftoverSV_command=\|^##reference=") || true`
+compare+=`diff ./output/output_hg38.unmapped validated_output/validated_output_hg38.unmapped || true`
+
+
+if [ "$compare" ]
+then
+        echo "$compare"
+        echo `basename $(pwd)`": ERROR, not the expected values"
+else
+        echo "ok - Finished"
+fi
+
@@ -0,0 +1,51 @@
+#!/bin/bash
+
+set -eo pipefail
+
+
+chain=$1
+ref_fasta_seq=$2
+
+# Synthetic chain and FASTA files (the $chain and $ref_fasta_seq files are not used):
+# - ../synthetic_data/hg19ToHg38.synthetic.chain
+# - ../synthetic_data/hg38.synthetic.fa
+#
+# Formats of the unmapped file ("-U" option):
+# - tsv: line number in the input VCF, case, reason code and its values
+#	=> output_hg38.tsv.unmapped
+# - counts: only the number of unmapped SV for each case
+#	=> output_hg38.counts.unmapped
+# The lifted VCF doesn't depend on the format of the unmapped file
+# The liftover summary gives the same number of unmapped SV with each format
+# (sum of the counts of validated_output_hg38.counts.unmapped)
+
+
+mkdir -p ./output
+rm -rf ./output/output_hg38.* ./output/*.lsvidx
+
+python3 $LIFTOVERSV/bin/liftoverSV.py -i ../synthetic_data/input_hg19.vcf -o ./output/output_hg38.tsv.vcf -c ../synthetic_data/hg19ToHg38.synthetic.chain -r ../synthetic_data/hg38.synthetic.fa -I ./output -U tsv | tee ./output/output_hg38.tsv.log
+python3 $LIFTOVERSV/bin/liftoverSV.py -i ../synthetic_data/input_hg19.vcf -o ./output/output_hg38.counts.vcf -c ../synthetic_data/hg19ToHg38.synthetic.chain -r ../synthetic_data/hg38.synthetic.fa -I ./output -U counts | tee ./output/output_hg38.counts.log
+
+
+compare=""
+n_unmapped=`awk '{n += $2} END {print n}' ./validated_output/validated_output_hg38.counts.unmapped`
+for format in tsv counts
+do
+        if ! grep -q "\* $n_unmapped unmapped SV" ./output/output_hg38.$format.log
+        then
+                compare+="$format: not the expected number of unmapped SV in the liftover summary ($n_unmapped)"
+        fi
+        # The command line and the reference path depend on the installation
+        compare+=`diff <(zcat ./output/output_hg38.$format.sort.vcf.gz | grep -v "^##liftoverSV_command=\|^##reference=") <(zcat ./validated_output/validated_output_hg38.sort.vcf.gz | grep -v "^##liftoverSV_command=\|^##reference=") || true`
+        compare+=`diff ./output/output_hg38.$format.unmapped validated_output/validated_output_hg38.$format.unmapped || true`
+done
+
+
+if [ "$compare" ]
+then
+        echo "$compare"
+        echo `basename $(pwd)`": ERROR, not the expected values"
+else
+        echo "ok - Finished"
+fi
+
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+
+# Check ChainLifter against the pyliftover semantics (liftoverSV <= 0.3.0):
+# - all the aligned blocks containing the 0-based position are searched
+#   and the block of the chain with the highest score is used (pyliftover "lifted[0]")
+# - "+" strand: tStart + (position - block start)
+# - "-" strand: tSize - 1 - (tStart + position - block start)
+# - positions in a gap, before the first or after the last block, and contigs absent
+#   from the chain file are not lifted
+#
+# The positions are lifted with "lift" (sorted, then shuffled: sweep-line cursors and their fallback,
+# with and without LRU cache) and with "lift_many" (shuffled contigs and positions).
+# The LRU cache is keyed by (chrom, pos) only (a position looked up again with another cursor is a hit)
+# and the lifter is freed without the garbage collector (no reference cycle).
+#
+# Command line example:
+# python3 ./check_chain_lifter.py ../synthetic_data/hg19ToHg38.synthetic.chain
+
+import gc
+import os
+import random
+import sys
+import weakref
+
+sys.path.insert(0, os.path.join(os.environ["LIFTOVERSV"], "share", "python3", "liftoverSV"))
+import numpy as np
+from io_tools.chain_lifter import ChainLifter
+
+
+def read_blocks(chain_file):
+    """
+    Return the aligned blocks of the chain file, as pyliftover reads them:
+    (src_chrom, src_start, src_end, tgt_chrom, tgt_start, tgt_strand, tgt_size, score)
+    """
+    blocks = []
+    with open(chain_file) as f:
+        for line in f:
+            fields = line.split()
+            if not fields:
+                continue
+            if fields[0] == "chain":
+                score = int(fields[1])
+                src_chrom, src_pos = fields[2], int(fields[5])
+                tgt_chrom, tgt_size, tgt_strand, tgt_pos = fields[7], int(fields[8]), fields[9], int(fields[10])
+                continue
+            size = int(fields[0])
+            blocks.append((src_chrom, src_pos, src_pos + size, tgt_chrom, tgt_pos, tgt_strand, tgt_size, score))
+            if len(fields) == 3:
+                src_pos += size + int(fields[1])
+                tgt_pos += size + int(fields[2])
+    return blocks
+
+
+def reference_lift(blocks, vcf_chrom, vcf_pos):
+    """
+    Brute-force lift of a 1-based position (scan of all the blocks)
+    """
+    bed_pos = vcf_pos - 1
+    hits = [b for b in blocks if b[0] == vcf_chrom and b[1] <= bed_pos < b[2]]
+    if not hits:
+        return None, None
+    src_chrom, src_start, src_end, tgt_chrom, tgt_start, tgt_strand, tgt_size, score = max(hits, key=lambda b: b[7])
+    new_bed_pos = tgt_start + bed_pos - src_start
+    if tgt_strand == "-":
+        new_bed_pos = tgt_size - 1 - new_bed_pos
+    return tgt_chrom, new_bed_pos + 1
+
+
+def check_cache(chain_file):
+    """
+    Return the errors of the LRU cache of ChainLifter
+    """
+    errors = []
+    chain = ChainLifter(chain_file, cache_size=10)
+    for cursor in ("POS", "END", "ALT"):
+        chain.lift("chr1", 5000, cursor=cursor)
+    hits, misses = chain.cache_info()[:2]
+    if (hits, misses) != (2, 1):
+        errors.append(f"LRU cache: {hits} hits and {misses} misses for 1 position and 3 cursors (expected: 2 hits and 1 miss)")
+
+    gc.disable()
+    try:
+        lifter = weakref.ref(chain)
+        del chain
+        if lifter() is not None:
+            errors.append("LRU cache: the ChainLifter is not freed without the garbage collector (reference cycle)")
+    finally:
+        gc.enable()
+    return errors
+
+
+def main(chain_file):
+    blocks = read_blocks(chain_file)
+
+    # Source contigs of the chain file (+ 100 bp after their end) and 1 unknown contig
+    contig_sizes = {}
+    with open(chain_file) as f:
+        for line in f:
+            if line.startswith("chain"):
+                fields = line.split()
+                contig_sizes[fields[2]] = int(fields[3]) + 100
+    contig_sizes["chrUnknown"] = 1000
+
+    queries = [(chrom, pos) for chrom, size in contig_sizes.items() for pos in range(1, size + 1)]
+    expected = {query: reference_lift(blocks, *query) for query in queries}
+
+    errors = check_cache(chain_file)
+    rng = random.Random(1)
+    shuffled = queries[:]
+    rng.shuffle(shuffled)
+
+    for cache_size in (0, 1000):
+        chain = ChainLifter(chain_file, cache_size=cache_size)
+        for label, ordered_queries in (("sorted", queries), ("shuffled", shuffled)):
+            for query in ordered_queries:
+                result = chain.lift(*query)
+                if result != expected[query]:
+                    errors.append(f"lift ({label}, cache_size={cache_size}) {query[0]}:{query[1]} => {result} (expected: {expected[query]})")
+
+    chain = ChainLifter(chain_file)
+    contig_ids = chain.contig_ids([chrom for chrom, _ in shuffled])
+    new_contig_ids, new_positions = chain.lift_many(contig_ids, np.array([pos for _, pos in shuffled]))
+    for query, new_chrom, new_pos in zip(shuffled, chain.target_contig_names(new_contig_ids), new_positions.tolist()):
+        result = (new_chrom, new_pos) if new_chrom is not None else (None, None)
+        if result != expected[query]:
+            errors.append(f"lift_many {query[0]}:{query[1]} => {result} (expected: {expected[query]})")
+
+    if errors:
+        print("\n".join(errors[:20]))
+        print(os.path.basename(os.getcwd()) + ": ERROR, not the expected values")
+    else:
+        n_lifted = sum(1 for new_chrom, _ in expected.values() if new_chrom is not None)
+        print(f"{n_lifted}/{len(queries)} positions lifted")
+        print("ok - Finished")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1])
@@ -0,0 +1,35 @@
+#!/bin/bash
+
+set -eo pipefail
+
+
+chain=$1
+ref_fasta_seq=$2
+
+# Synthetic chain file (the $chain and $ref_fasta_seq files are not used):
+# - ../synthetic_data/hg19ToHg38.synthetic.chain
+#
+# chain 1000000 chr1 40000 + 0 20000 chr1 42000 + 1000 21300 1        => gap: chr1:8001-8500 (hg19)
+# chain 900000 chr1 40000 + 20000 38000 chr1 42000 - 2000 20000 2     => "-" strand
+# chain 500000 chr1 40000 + 10000 14000 chr3 8000 + 1000 5000 3       => overlaps chain 1 (lower score)
+# chain 2000000 chr1 40000 + 30000 32000 chr3 8000 + 5000 7000 4      => overlaps chain 2 (higher score)
+# chain 800000 chr2 20000 + 0 15000 chr2 20000 + 2000 16800 5         => gap: chr2:5001-5200 (hg19)
+# chain 700000 chr2 20000 + 15000 20000 chr1 42000 + 36000 41000 6    => chr2 to chr1
+#
+# Every position of chr1, chr2 (+ 100 bp after their end) and of an unknown contig is lifted
+# with ChainLifter.lift and ChainLifter.lift_many, and compared to the pyliftover semantics
+# (brute-force search of the highest score block)
+#
+# LRU cache of ChainLifter.lift ("-L" option): keyed by (chrom, pos) only, whatever the cursor (POS, END, ALT)
+
+
+check=`python3 ./check_chain_lifter.py ../synthetic_data/hg19ToHg38.synthetic.chain`
+
+if [[ "$check" != *"ok - Finished"* ]]
+then
+        echo "$check"
+        echo `basename $(pwd)`": ERROR, not the expected values"
+else
+        echo "ok - Finished"
+fi
+